@@ -0,0 +1,293 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Measure the performance of the hot paths of DataTracker: retrieving lists
+# of objects (_retrieve_multi), retrieving individual objects (_retrieve),
+# the caches, and decoding. The objects are served by a TastypieServer, on
+# this machine, so no network access is needed and the results can be
+# compared between commits. By default, the objects are synthetic fixtures
+# for some of the largest endpoints of the datatracker, but an archive of
+# real responses, recorded with a RecordingTransport, can be used instead.
+#
+# Each operation is measured in three scenarios:
+#   cold-network -- the objects are fetched from the server, with no caches
+#   warm-disk    -- the objects, and the list queries, are in an SQLiteCache
+#                   written by an earlier process, and the memory cache is off
+#   warm-memory  -- the objects are in the memory cache, having been
+#                   retrieved earlier by the same DataTracker (using
+#                   resolve_many(), for the objects of a list), and the list
+#                   queries are in an SQLiteCache
+#
+# For each, the objects retrieved per second, the peak number of bytes
+# allocated while retrieving them, and the peak RSS of the process are
+# reported. Tracing allocations is slow, so they are measured in a second
+# pass that repeats the timed pass, with a DataTracker prepared in the same
+# way, rather than in the timed pass itself.
+# Each scenario runs in a fresh process, so its peak RSS is not affected by
+# those run before it.
+#
+# For example:
+#   python3 benchmarks/datatracker.py --output before.json
+#   ... make some changes ...
+#   python3 benchmarks/datatracker.py --output after.json --compare before.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime           import datetime, timedelta
+from pathlib            import Path
+from typing             import Any, Callable, Dict, List, Optional, Tuple
+
+import multiprocessing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+
+import ietfdata.datatracker
+
+from ietfdata.datatracker     import *
+from ietfdata.tastypie_server import TastypieServer
+from ietfdata.transport       import *
+from fixtures                 import document_json, document_author_json, document_event_json, person_json, session_assignment_json
+
+# =============================================================================
+# Fixtures:
+
+# The endpoints to benchmark, with the type of their objects, and a function
+# to generate their fixtures.
+ENDPOINTS = {
+    "docevent"                : ("/api/v1/doc/docevent/",                    "DocumentEvent",     document_event_json),
+    "person"                  : ("/api/v1/person/person/",                   "Person",            person_json),
+    "document"                : ("/api/v1/doc/document/",                    "Document",          document_json),
+    "documentauthor"          : ("/api/v1/doc/documentauthor/",              "DocumentAuthor",    document_author_json),
+    "schedtimesessassignment" : ("/api/v1/meeting/schedtimesessassignment/", "SessionAssignment", session_assignment_json),
+} # type: Dict[str, Any]
+
+OPERATIONS = ["list", "get"]
+SCENARIOS  = ["cold-network", "warm-disk", "warm-memory"]
+
+
+class FixtureTransport(Transport):
+    """
+    A transport that returns all the objects of an endpoint as a single page.
+    """
+    def __init__(self, num_objects: int) -> None:
+        self.num_objects = num_objects
+
+
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        for endpoint, type_name, make_json in ENDPOINTS.values():
+            if url == endpoint:
+                objs = [make_json(i) for i in range(self.num_objects)]
+                body = {"meta": {"limit": len(objs), "next": None, "offset": 0, "total_count": len(objs)}, "objects": objs}
+                return Response(200, CaseInsensitiveDict({"Content-Type": "application/json"}), json.dumps(body).encode("utf-8"))
+        return Response(404, CaseInsensitiveDict())
+
+
+def write_fixtures(archive: Path, num_objects: int) -> None:
+    transport = RecordingTransport(archive, FixtureTransport(num_objects))
+    for endpoint, type_name, make_json in ENDPOINTS.values():
+        transport.get(endpoint, {}, {})
+    transport.close()
+
+# =============================================================================
+# Running the benchmarks:
+
+def peak_rss() -> Optional[int]:
+    # The peak resident set size of this process, in bytes
+    if sys.platform == "win32":
+        return None
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(maxrss) if sys.platform == "darwin" else int(maxrss) * 1024
+
+
+def run_scenario(base_url: str, name: str, operation: str, scenario: str, uris: List[str], num_objects: int, cache_file: str, prepare: bool = False) -> Dict[str, Any]:
+    # Run one scenario, in a child process. If prepare is True, instead fill
+    # the cache in cache_file, ready for the warm-disk scenario.
+    endpoint, type_name, make_json = ENDPOINTS[name]
+    obj_type = getattr(ietfdata.datatracker, type_name)
+    uri_type = obj_type.__dataclass_fields__["resource_uri"].type
+
+    def make_dt() -> DataTracker:
+        if scenario == "cold-network":
+            return DataTracker(base_url=base_url, memory_cache_size=0)
+        elif scenario == "warm-disk":
+            return DataTracker(base_url=base_url, memory_cache_size=0, cache=SQLiteCache(Path(cache_file)), query_ttl=timedelta(days=1))
+        else:
+            return DataTracker(base_url=base_url, memory_cache_size=num_objects + 1, query_ttl=timedelta(days=1), cache=SQLiteCache(Path(cache_file)))
+
+    def run(dt: DataTracker) -> int:
+        count = 0
+        if operation == "list":
+            for obj in dt._retrieve_multi(URI(endpoint), obj_type):
+                count += 1
+        else:
+            for uri in uris:
+                if dt._retrieve(uri_type(uri), obj_type) is not None:
+                    count += 1
+        return count
+
+    def warm(dt: DataTracker) -> None:
+        # Fill the memory cache. The results of list queries are not held in
+        # memory, so the objects listed are loaded using resolve_many(), and
+        # the repeated list query is replayed from the query cache.
+        if operation == "list":
+            listed = [obj.resource_uri for obj in dt._retrieve_multi(URI(endpoint), obj_type)]
+            dt.resolve_many(listed, obj_type)
+        else:
+            run(dt)
+
+    if prepare:
+        dt = make_dt()
+        run(dt)
+        dt.close()
+        return {}
+
+    def measure(traced: bool) -> Tuple[int, float, int, int]:
+        # Returns the number of objects retrieved, the time taken, the peak
+        # bytes allocated if traced, and the number of HTTP requests made.
+        dt = make_dt()
+        if scenario == "warm-memory":
+            warm(dt)
+        before = dt.http_req
+        if traced:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start   = time.perf_counter()
+        count   = run(dt)
+        seconds = time.perf_counter() - start
+        allocated = 0
+        if traced:
+            allocated = tracemalloc.get_traced_memory()[1] - baseline
+            tracemalloc.stop()
+        requests = dt.http_req - before
+        dt.close()
+        return count, seconds, allocated, requests
+
+    count, seconds, _, http_requests = measure(traced=False)
+    _, _, allocated, _ = measure(traced=True)
+
+    return {
+        "endpoint"           : name,
+        "operation"          : operation,
+        "scenario"           : scenario,
+        "objects"            : count,
+        "seconds"            : seconds,
+        "objects_per_second" : count / seconds if seconds > 0 else None,
+        "bytes_allocated"    : allocated,
+        "peak_rss"           : peak_rss(),
+        "http_requests"      : http_requests
+    }
+
+
+def in_child(function: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+    # Run function in a fresh process, returning its result.
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    before = {(r["endpoint"], r["operation"], r["scenario"]): r for r in baseline["results"]}
+    print("")
+    print("Compared with {}:".format(baseline.get("commit")))
+    for r in results["results"]:
+        b = before.get((r["endpoint"], r["operation"], r["scenario"]))
+        if b is None or not b["objects_per_second"] or not r["objects_per_second"]:
+            continue
+        print("  {:<24} {:<4} {:<12}  objects/s {:+7.1f}%   bytes allocated {:+7.1f}%".format(
+              r["endpoint"], r["operation"], r["scenario"],
+              100.0 * (r["objects_per_second"] / b["objects_per_second"] - 1.0),
+              100.0 * (r["bytes_allocated"] / b["bytes_allocated"] - 1.0) if b["bytes_allocated"] else 0.0))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark DataTracker, using objects served locally")
+    parser.add_argument("--objects",   type=int, default=5000, help="the number of fixture objects per endpoint")
+    parser.add_argument("--gets",      type=int, default=500,  help="the number of objects to retrieve individually")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="the endpoints to benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="the scenarios to run")
+    parser.add_argument("--archive",   type=Path, help="an archive of recorded responses to use, rather than fixtures")
+    parser.add_argument("--output",    type=Path, help="the file in which to save the results, as JSON")
+    parser.add_argument("--compare",   type=Path, help="the results of an earlier run, to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = args.archive
+        if archive is None:
+            archive = Path(tmp_dir, "fixtures.jsonl.gz")
+            write_fixtures(archive, args.objects)
+        results = {
+            "commit"       : git_commit(),
+            "date"         : datetime.now().isoformat(),
+            "python"       : platform.python_version(),
+            "json_backend" : JSON_BACKEND,
+            "results"      : []
+        } # type: Dict[str, Any]
+        with TastypieServer(archive) as server:
+            for name in args.endpoints.split(","):
+                endpoint = ENDPOINTS[name][0]
+                objs     = server.endpoints.get(endpoint, [])
+                uris     = [obj["resource_uri"] for obj in objs[:args.gets]]
+                for operation in OPERATIONS:
+                    for scenario in args.scenarios.split(","):
+                        cache_file = str(Path(tmp_dir, "{}-{}-{}.db".format(name, operation, scenario)))
+                        if scenario == "warm-disk":
+                            in_child(run_scenario, server.base_url, name, operation, scenario, uris, len(objs), cache_file, True)
+                        result = in_child(run_scenario, server.base_url, name, operation, scenario, uris, len(objs), cache_file)
+                        results["results"].append(result)
+                        print("{:<24} {:<4} {:<12} {:7d} objects {:10.0f} objects/s {:12d} bytes allocated {:6.1f} MB peak RSS".format(
+                              name, operation, scenario, result["objects"], result["objects_per_second"] or 0.0,
+                              result["bytes_allocated"], (result["peak_rss"] or 0) / 1e6))
+
+    if args.output is not None:
+        with open(args.output, "w") as outf:
+            json.dump(results, outf, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as inf:
+            compare(results, json.load(inf))
+
+
+if __name__ == "__main__":
+    main()
+
+# =============================================================================
+# vim: set tw=0 ai:
@@ -0,0 +1,104 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Measure the memory used per object when holding many Datatracker objects.
+# The objects are decoded from JSON, as they would be when read from the
+# cache, and compared against equivalent dataclasses that have a __dict__
+# and a separate params dict in each URI, as used by ietfdata 0.1.x, and
+# against the slotted classes without URI interning, to show the saving
+# from each separately.
+
+import os
+import sys
+import tracemalloc
+
+from dataclasses import dataclass, field, fields, make_dataclass
+from datetime    import datetime
+from typing      import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+
+from ietfdata.datatracker import *
+from fixtures             import document_event_json
+
+# =============================================================================
+
+@dataclass(frozen=True)
+class UnslottedURI:
+    uri    : str
+    params : Dict[str, Any] = field(default_factory=dict)
+
+
+UnslottedDocumentEvent = make_dataclass("UnslottedDocumentEvent", [(f.name, f.type) for f in fields(DocumentEvent)], frozen=True)
+
+
+def unslotted_document_event(obj_json: Dict[str, Any]) -> Any:
+    return UnslottedDocumentEvent(
+        by           = UnslottedURI(obj_json["by"]),
+        desc         = obj_json["desc"],
+        doc          = UnslottedURI(obj_json["doc"]),
+        id           = obj_json["id"],
+        resource_uri = UnslottedURI(obj_json["resource_uri"]),
+        rev          = obj_json["rev"],
+        time         = datetime.fromisoformat(obj_json["time"]),
+        type         = obj_json["type"])
+
+
+def slotted_document_event(obj_json: Dict[str, Any]) -> DocumentEvent:
+    # The slotted classes, but with a separate params dict in each URI and
+    # without interning the URIs that refer to other objects.
+    return DocumentEvent(
+        by           = PersonURI(obj_json["by"]),
+        desc         = obj_json["desc"],
+        doc          = DocumentURI(obj_json["doc"]),
+        id           = obj_json["id"],
+        resource_uri = DocumentEventURI(obj_json["resource_uri"]),
+        rev          = obj_json["rev"],
+        time         = datetime.fromisoformat(obj_json["time"]),
+        type         = obj_json["type"])
+
+
+def bytes_per_object(decode: Callable[[Dict[str, Any]], Any], objs_json: List[Dict[str, Any]]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs   = [decode(obj_json) for obj_json in objs_json]
+    after  = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(objs)
+
+
+dt        = DataTracker()
+objs_json = [document_event_json(i) for i in range(100000)]
+
+unslotted = bytes_per_object(unslotted_document_event, objs_json)
+slotted   = bytes_per_object(slotted_document_event,   objs_json)
+interned  = bytes_per_object(lambda obj_json: dt._decode(obj_json, DocumentEvent), objs_json)
+
+print("DocumentEvent: {:6.0f} bytes per object with __dict__".format(unslotted))
+print("DocumentEvent: {:6.0f} bytes per object with __slots__".format(slotted))
+print("DocumentEvent: {:6.0f} bytes per object with __slots__ and interned URIs".format(interned))
+
+# =============================================================================
@@ -34,7 +34,7 @@ from ietfdata.datatracker import *
 # =============================================================================
 # Example: print an organisational chart for the IETF
 
-dt = DataTracker(cache_dir=Path("cache"))
+dt = DataTracker(cache_dir=Path("cache"), query_ttl=timedelta(hours=1))
 
 def print_group(group : Group, level : int):
     for i in range(0, level):
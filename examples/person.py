@@ -51,12 +51,11 @@ for email in dt.email_for_person(p):
     print("Email: {} {}".format(email.address, primary))
 
     for subscriptions in dt.mailing_list_subscriptions(email.address):
-        for mailing_list_uri in subscriptions.lists:
-            mailing_list = dt.mailing_list(mailing_list_uri)
+        for mailing_list in dt.resolve_many(subscriptions.lists, MailingList):
             print("  Subscribed to mailing list {}".format(mailing_list.name))
 
-for d in dt.documents_authored_by_person(p):
-    doc = dt.document(d.document)
+authored = list(dt.documents_authored_by_person(p))
+for d, doc in zip(authored, dt.resolve_many([d.document for d in authored], Document)):
     print("Document: {}".format(doc.title))
     print("  {}".format(doc.name))
     print("  Affiliation: {}".format(d.affiliation))
@@ -44,38 +44,134 @@
 #   RFC 6359 "Datatracker Extensions to Include IANA and RFC Editor Processing Information"
 #   RFC 7760 "Statement of Work for Extensions to the IETF Datatracker for Author Statistics"
 
-from datetime    import datetime, timedelta
-from enum        import Enum
-from typing      import List, Optional, Tuple, Dict, Iterator, Type, TypeVar, Any
-from dataclasses import dataclass, field
-from pathlib     import Path
-from pavlova     import Pavlova
-from pavlova.parsers import GenericParser
-
+from collections       import deque, namedtuple, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime           import datetime, timedelta
+from enum               import Enum
+from typing             import List, Optional, Tuple, Dict, Deque, Iterator, Sequence, Set, Type, TypeVar, Any, Callable, Union, cast
+from dataclasses        import dataclass, field, fields
+from email.utils        import formatdate, parsedate_to_datetime
+from pathlib            import Path
+from pavlova            import Pavlova, PavlovaParsingError
+from pavlova.parsers    import GenericParser
+from types              import MappingProxyType
+from urllib.parse       import urlencode
+
+import copy
 import glob
+import hashlib
 import json
+import os
+import queue
+import random
 import requests
 import re
+import sqlite3
+import threading
+import time
+import weakref
+
+from ietfdata.files     import replace_file
+from ietfdata.transport import Transport, HTTPTransport, Response
 
 # =================================================================================================================================
 # Classes to represent the JSON-serialised objects returned by the Datatracker API:
 
+# ---------------------------------------------------------------------------------------------------------------------------------
+# Compact representation:
+#
+# The classes representing Datatracker objects are frozen dataclasses that
+# are rebuilt by _slotted() to use __slots__. They have no per-instance
+# __dict__, roughly halving their size, since large numbers of them may be
+# held in memory. (Python 3.10 adds dataclass(slots=True) that does this).
+#
+# URIs and Resources are hashable, and hash on the URI. The subclasses are
+# declared with eq=False, so they inherit __eq__() and __hash__() from URI
+# and Resource rather than having them generated from their fields.
+
+def _slotted(cls: Type[Any]) -> Type[Any]:
+    cls_dict = dict(cls.__dict__)
+    base_slots = set()  # type: Set[str]
+    for base in cls.__mro__[1:]:
+        base_slots.update(getattr(base, "__slots__", ()))
+    cls_dict["__slots__"] = tuple(f.name for f in fields(cls) if f.name not in base_slots)
+    if "__weakref__" not in base_slots:
+        cls_dict["__slots__"] += ("__weakref__",)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    for f in fields(cls):
+        cls_dict.pop(f.name, None)
+    new_cls = type(cls.__name__, cls.__bases__, cls_dict)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
+
+
+def _getstate(self: Any) -> List[Any]:
+    # Pickle support for the slotted classes. The shared _NO_PARAMS mapping
+    # cannot be pickled, and is replaced by an empty dict.
+    return [dict(value) if isinstance(value, MappingProxyType) else value for value in (getattr(self, f.name) for f in fields(self))]
+
+
+def _setstate(self: Any, state: List[Any]) -> None:
+    for f, value in zip(fields(self), state):
+        object.__setattr__(self, f.name, value)
+
+
 # ---------------------------------------------------------------------------------------------------------------------------------
 # URI types:
 
+@_slotted
 @dataclass(frozen=True)
 class URI:
     uri    : str
     params : Dict[str, Any] = field(default_factory=dict)
 
-
-@dataclass(frozen=True)
+    __getstate__ = _getstate
+    __setstate__ = _setstate
+
+    def __eq__(self, other: Any) -> bool:
+        # URIs decoded from the datatracker are interned, so are often the
+        # same object.
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return bool(self.uri == other.uri and self.params == other.params)
+
+    def __hash__(self) -> int:
+        return hash(self.uri)
+
+
+# URIs that are references from one object to another, rather than queries,
+# share this read-only mapping as their params, rather than each having an
+# empty dict.
+_NO_PARAMS = cast(Dict[str, Any], MappingProxyType({}))
+
+# The URIs that are references from one object to another are interned, so
+# that objects referring to the same object share a single URI instance. A
+# URI is discarded from this table once no object refers to it.
+_interned_uris = {} # type: Dict[Type[URI], weakref.WeakValueDictionary[str, URI]]
+
+def _intern_uri(uri_type: Type[URI], uri: str) -> URI:
+    interned = _interned_uris.get(uri_type)
+    if interned is None:
+        interned = _interned_uris.setdefault(uri_type, weakref.WeakValueDictionary())
+    obj = interned.get(uri)
+    if obj is None:
+        obj = uri_type(uri, _NO_PARAMS)
+        interned[uri] = obj
+    return obj
+
+
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/document/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class GroupURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/group/group/")
@@ -84,23 +180,41 @@ class GroupURI(URI):
 # ---------------------------------------------------------------------------------------------------------------------------------
 # Resource type
 
+@_slotted
 @dataclass(frozen=True)
 class Resource:
     resource_uri : URI
 
+    __getstate__ = _getstate
+    __setstate__ = _setstate
+
+    def __eq__(self, other: Any) -> bool:
+        # Lazy objects (see _lazy_class()) compare equal to the equivalent
+        # non-lazy objects.
+        if self is other:
+            return True
+        if getattr(other, "_lazy_base", other.__class__) is not getattr(self, "_lazy_base", self.__class__):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__dataclass_fields__)
+
+    def __hash__(self) -> int:
+        return hash(self.resource_uri.uri)
+
 T = TypeVar('T', bound=Resource)
 
 
 # ---------------------------------------------------------------------------------------------------------------------------------
 # Types relating to people:
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class PersonURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/person/person/") or self.uri.startswith("/api/v1/person/historicalperson/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Person(Resource):
     resource_uri    : PersonURI
     id              : int
@@ -116,7 +230,8 @@ class Person(Resource):
     consent         : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class HistoricalPerson(Person):
     history_change_reason : Optional[str]
     history_user          : Optional[str]
@@ -125,13 +240,15 @@ class HistoricalPerson(Person):
     history_date          : datetime
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class PersonAliasURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/person/alias/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class PersonAlias(Resource):
     id                 : int
     resource_uri       : PersonAliasURI
@@ -139,13 +256,15 @@ class PersonAlias(Resource):
     name               : str
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class PersonEventURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/person/personevent/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class PersonEvent(Resource):
     desc            : str
     id              : int
@@ -158,13 +277,15 @@ class PersonEvent(Resource):
 # ---------------------------------------------------------------------------------------------------------------------------------
 # Types relating to email addresses:
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class EmailURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/person/email/") or self.uri.startswith("/api/v1/person/historicalemail/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Email(Resource):
     resource_uri : EmailURI
     person       : PersonURI
@@ -175,7 +296,8 @@ class Email(Resource):
     active       : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class HistoricalEmail(Email):
     history_change_reason : Optional[str]
     history_user          : Optional[str]
@@ -187,13 +309,15 @@ class HistoricalEmail(Email):
 # ---------------------------------------------------------------------------------------------------------------------------------
 # Types relating to documents:
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentTypeURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/name/doctypename/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentType(Resource):
     resource_uri : DocumentTypeURI
     name         : str
@@ -204,26 +328,30 @@ class DocumentType(Resource):
     order        : int
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentStateTypeURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/statetype/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentStateType(Resource):
     resource_uri : DocumentStateTypeURI
     label        : str
     slug         : str
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentStateURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/state/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentState(Resource):
     id           : int
     resource_uri : DocumentStateURI
@@ -236,13 +364,15 @@ class DocumentState(Resource):
     used         : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class StreamURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/name/streamname/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Stream(Resource):
     resource_uri : StreamURI
     name         : str
@@ -252,19 +382,22 @@ class Stream(Resource):
     order        : int
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SubmissionURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/submit/submission/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SubmissionCheckURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/submit/submissioncheck/")
         
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Submission(Resource):
     abstract        : str
     access_key      : str
@@ -299,13 +432,15 @@ class Submission(Resource):
             yield (file_type, "https://www.ietf.org/archive/id/"  + self.name + "-" + self.rev + file_type)
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SubmissionEventURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/submit/submissionevent/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SubmissionEvent(Resource):
     by              : Optional[PersonURI]
     desc            : str
@@ -317,7 +452,8 @@ class SubmissionEvent(Resource):
 
 # DocumentURI is defined earlier, to avoid circular dependencies
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Document(Resource):
     id                 : int
     resource_uri       : DocumentURI
@@ -395,13 +531,15 @@ class Document(Resource):
         return url
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentAliasURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/docalias/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentAlias(Resource):
     id           : int
     resource_uri : DocumentAliasURI
@@ -409,13 +547,15 @@ class DocumentAlias(Resource):
     name         : str
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentEventURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/docevent/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentEvent(Resource):
     by              : PersonURI
     desc            : str
@@ -427,13 +567,15 @@ class DocumentEvent(Resource):
     type            : str
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class BallotPositionNameURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/name/ballotpositionname/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class BallotPositionName(Resource):
     blocking     : bool
     desc         : Optional[str]
@@ -444,13 +586,15 @@ class BallotPositionName(Resource):
     used         : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class BallotTypeURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/ballottype/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class BallotType(Resource):
     doc_type     : DocumentTypeURI
     id           : int
@@ -463,13 +607,15 @@ class BallotType(Resource):
     used         : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class BallotDocumentEventURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/ballotdocevent/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class BallotDocumentEvent(Resource):
     ballot_type     : BallotTypeURI
     by              : PersonURI
@@ -483,13 +629,15 @@ class BallotDocumentEvent(Resource):
     type            : str
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class RelationshipTypeURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/name/docrelationshipname/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class RelationshipType(Resource):
     resource_uri   : RelationshipTypeURI
     slug           : str
@@ -500,13 +648,15 @@ class RelationshipType(Resource):
     revname        : str
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class RelatedDocumentURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/relateddocument/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class RelatedDocument(Resource):
     id              : int
     relationship    : RelationshipTypeURI
@@ -519,7 +669,8 @@ class DocumentAuthorURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/doc/documentauthor/")
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class DocumentAuthor(Resource):
     id           : int
     order        : int
@@ -535,13 +686,15 @@ class DocumentAuthor(Resource):
 # Types relating to groups:
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class GroupStateURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/name/groupstatename/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class GroupState(Resource):
     resource_uri   : GroupStateURI
     slug           : str
@@ -554,7 +707,8 @@ class GroupState(Resource):
 # GroupURI is defined earlier, to avoid circular dependencies
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Group(Resource):
     acronym        : str
     ad             : Optional[PersonURI]
@@ -584,19 +738,22 @@ class MeetingStatus(Enum):
     COMPLETED = 3
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MeetingURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/meeting/meeting/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MeetingTypeURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/name/meetingtypename/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MeetingType(Resource):
     name         : str
     order        : int
@@ -606,13 +763,15 @@ class MeetingType(Resource):
     used         : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class ScheduleURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/meeting/schedule/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Schedule(Resource):
     """
     A particular version of the meeting schedule (i.e., the meeting agenda)
@@ -630,7 +789,8 @@ class Schedule(Resource):
     badness      : Optional[str]
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Meeting(Resource):
     id                               : int
     resource_uri                     : MeetingURI
@@ -675,19 +835,22 @@ class Meeting(Resource):
             return MeetingStatus.ONGOING
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SessionURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/meeting/session/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class TimeslotURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/meeting/timeslot/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Timeslot(Resource):
     id            : int
     resource_uri  : TimeslotURI
@@ -702,13 +865,15 @@ class Timeslot(Resource):
     modified      : datetime
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SessionAssignmentURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/meeting/schedtimesessassignment/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class SessionAssignment(Resource):
     """
     The assignment of a `session` to a `timeslot` within a meeting `schedule`
@@ -726,7 +891,8 @@ class SessionAssignment(Resource):
     badness      : int
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class Session(Resource):
     id                  : int
     type                : str           # FIXME: this is a URI
@@ -750,13 +916,15 @@ class Session(Resource):
 # ---------------------------------------------------------------------------------------------------------------------------------
 # Types relating to mailing lists:
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MailingListURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/mailinglists/list/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MailingList(Resource):
     id           : int
     resource_uri : MailingListURI
@@ -765,13 +933,15 @@ class MailingList(Resource):
     advertised   : bool
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MailingListSubscriptionsURI(URI):
     def __post_init__(self) -> None:
         assert self.uri.startswith("/api/v1/mailinglists/subscribed/")
 
 
-@dataclass(frozen=True)
+@_slotted
+@dataclass(frozen=True, eq=False)
 class MailingListSubscriptions(Resource):
     id           : int
     resource_uri : MailingListSubscriptionsURI
@@ -780,23 +950,901 @@ class MailingListSubscriptions(Resource):
     time         : datetime
 
 
+# =================================================================================================================================
+# JSON encoding and decoding:
+#
+# Responses from the datatracker, and objects in the cache, are decoded using
+# orjson if it is installed, since this is several times faster than the json
+# module from the standard library, otherwise using the json module. The
+# name of the library in use is in JSON_BACKEND.
+
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+
+    def _json_loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+    JSON_BACKEND = "json"
+
+    def _json_loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+
+# =================================================================================================================================
+# Classes to cache Datatracker objects:
+
+@dataclass(frozen=True)
+class CacheEntry:
+    obj_json : Dict[str, Any]   # The JSON object, as returned by the datatracker
+    fetched  : datetime         # The time the object was fetched from the datatracker
+    etag     : Optional[str] = None  # The ETag of the object, if known
+
+
+@dataclass(frozen=True)
+class QueryCacheEntry:
+    uris    : List[str]         # The resource URIs of the results of the query, in order
+    fetched : datetime          # The time the query was made to the datatracker
+
+
+class DataTrackerCache:
+    """
+    The interface to a cache of Datatracker objects. Objects are identified by
+    their resource URI (e.g., "/api/v1/person/person/20209/"). The cache can
+    also hold the results of list queries, as the URIs of the objects returned,
+    identified by the query URI (e.g., "/api/v1/group/group/?parent=1234").
+    Subclasses must be safe to use from several threads.
+    """
+    def get(self, uri: str) -> Optional[CacheEntry]:
+        """
+        Returns the cached object with the specified URI, or None if the object
+        is not in the cache.
+        """
+        raise NotImplementedError
+
+
+    def put(self, uri: str, obj_json: Dict[str, Any], etag: Optional[str] = None) -> None:
+        """
+        Adds an object to the cache, replacing any existing object with that URI.
+        The fetch time is set to the current time. Caches are not required to
+        store the ETag.
+        """
+        raise NotImplementedError
+
+
+    def put_many(self, objs: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Adds several objects, given as (uri, obj_json) pairs, to the cache.
+        """
+        for uri, obj_json in objs:
+            self.put(uri, obj_json)
+
+
+    def get_query(self, query: str) -> Optional[QueryCacheEntry]:
+        """
+        Returns the cached results of the specified query, or None if the
+        query is not in the cache. Caches that do not hold the results of
+        queries always return None.
+        """
+        return None
+
+
+    def put_query(self, query: str, uris: List[str]) -> None:
+        """
+        Adds the results of a query to the cache, replacing any existing
+        results of that query.
+        """
+        pass
+
+
+    def close(self) -> None:
+        """
+        Releases any resources held by the cache.
+        """
+        pass
+
+
+class FileCache(DataTrackerCache):
+    """
+    A cache that stores each object as a JSON file within a directory. The path
+    of each file follows the URI of the object, for example, the file for
+    /api/v1/person/person/20209/ is {cache_dir}/api/v1/person/person/20209.json
+    The modification time of the file is the time the object was fetched. The
+    ETag is not stored. Files are replaced atomically, so the cache can be read
+    while it is being updated by other threads or processes.
+    """
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+
+
+    def _filepath(self, uri: str) -> Path:
+        return Path(self.cache_dir, uri[1:-1] + ".json")
+
+
+    def get(self, uri: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._filepath(uri), "rb") as cache_file:
+                fetched  = datetime.fromtimestamp(os.fstat(cache_file.fileno()).st_mtime)
+                obj_json = _json_loads(cache_file.read())
+        except FileNotFoundError:
+            return None
+        return CacheEntry(obj_json, fetched)
+
+
+    def put(self, uri: str, obj_json: Dict[str, Any], etag: Optional[str] = None) -> None:
+        cache_filepath = self._filepath(uri)
+        cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+        with replace_file(cache_filepath) as cache_file:
+            cache_file.write(_json_dumps(obj_json))
+
+
+    def _query_filepath(self, query: str) -> Path:
+        # Queries can be long and contain any character, so are stored in
+        # files named by their hash.
+        return Path(self.cache_dir, "queries", hashlib.sha256(query.encode("utf-8")).hexdigest() + ".json")
+
+
+    def get_query(self, query: str) -> Optional[QueryCacheEntry]:
+        try:
+            with open(self._query_filepath(query), "rb") as cache_file:
+                fetched    = datetime.fromtimestamp(os.fstat(cache_file.fileno()).st_mtime)
+                query_json = _json_loads(cache_file.read())
+        except FileNotFoundError:
+            return None
+        if query_json["query"] != query:
+            return None
+        return QueryCacheEntry(query_json["uris"], fetched)
+
+
+    def put_query(self, query: str, uris: List[str]) -> None:
+        cache_filepath = self._query_filepath(query)
+        cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+        with replace_file(cache_filepath) as cache_file:
+            cache_file.write(_json_dumps({"query": query, "uris": uris}))
+
+
+class SQLiteCache(DataTrackerCache):
+    """
+    A cache that stores objects in an SQLite database, in a single table keyed
+    by URI. Each object is stored as JSON along with the time it was fetched.
+    The results of queries are stored in a second table, keyed by the query.
+    The database uses write-ahead logging, so it can be read by several
+    processes while being updated.
+    """
+    def __init__(self, database: Path) -> None:
+        self.database = database
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(str(database), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS objects (uri TEXT PRIMARY KEY, json TEXT NOT NULL, fetched REAL NOT NULL, etag TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, uris TEXT NOT NULL, fetched REAL NOT NULL)")
+        self._db.commit()
+
+
+    def get(self, uri: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute("SELECT json, fetched, etag FROM objects WHERE uri = ?", (uri,)).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(_json_loads(row[0]), datetime.fromtimestamp(row[1]), row[2])
+
+
+    def put(self, uri: str, obj_json: Dict[str, Any], etag: Optional[str] = None) -> None:
+        row = (uri, _json_dumps(obj_json).decode("utf-8"), time.time(), etag)
+        with self._lock:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO objects (uri, json, fetched, etag) VALUES (?, ?, ?, ?)", row)
+
+
+    def put_many(self, objs: List[Tuple[str, Dict[str, Any]]]) -> None:
+        fetched = time.time()
+        rows = [(uri, _json_dumps(obj_json).decode("utf-8"), fetched) for uri, obj_json in objs]
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO objects (uri, json, fetched, etag) VALUES (?, ?, ?, NULL)", rows)
+
+
+    def get_query(self, query: str) -> Optional[QueryCacheEntry]:
+        with self._lock:
+            row = self._db.execute("SELECT uris, fetched FROM queries WHERE query = ?", (query,)).fetchone()
+        if row is None:
+            return None
+        return QueryCacheEntry(_json_loads(row[0]), datetime.fromtimestamp(row[1]))
+
+
+    def put_query(self, query: str, uris: List[str]) -> None:
+        row = (query, _json_dumps(uris).decode("utf-8"), time.time())
+        with self._lock:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO queries (query, uris, fetched) VALUES (?, ?, ?)", row)
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# The time for which cached objects are considered fresh, keyed by the type of
+# their URI. Objects with URI types not listed use the entry for the closest
+# listed base class. None means that the objects never expire. The tables of
+# names change rarely, if ever, whereas people and documents are frequently
+# updated.
+CACHE_TTL = {
+    URI                         : timedelta(days=1),
+    BallotPositionNameURI       : None,
+    BallotTypeURI               : timedelta(days=7),
+    DocumentStateTypeURI        : timedelta(days=7),
+    DocumentStateURI            : timedelta(days=7),
+    DocumentTypeURI             : None,
+    DocumentURI                 : timedelta(hours=1),
+    GroupStateURI               : None,
+    MeetingTypeURI              : None,
+    PersonURI                   : timedelta(days=1),
+    RelationshipTypeURI         : None,
+    StreamURI                   : None,
+} # type: Dict[Type[URI], Optional[timedelta]]
+
+
+class MemoryCache:
+    """
+    A size-bounded cache of parsed Datatracker objects, held in memory and
+    keyed by resource URI. When full, the least recently used objects are
+    discarded. The objects are frozen, so the same instance can be returned
+    to every caller. The number of lookups that found or did not find the
+    requested object are counted in `hits` and `misses`.
+    """
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max_size
+        self.hits     = 0
+        self.misses   = 0
+        self._objs    = OrderedDict() # type: OrderedDict[str, Tuple[Resource, datetime]]
+        self._lock    = threading.Lock()
+
+
+    def __len__(self) -> int:
+        return len(self._objs)
+
+
+    def get(self, uri: str, obj_type: Type[T], max_age: Optional[timedelta] = None) -> Optional[T]:
+        """
+        Returns the object with the specified URI, or None if that object is
+        not in the cache, is not of type obj_type, or was added to the cache
+        more than max_age ago.
+        """
+        with self._lock:
+            obj, added = self._objs.get(uri, (None, datetime.now()))
+            if isinstance(obj, obj_type) and (max_age is None or datetime.now() - added < max_age):
+                self._objs.move_to_end(uri)
+                self.hits += 1
+                return obj
+            self.misses += 1
+            return None
+
+
+    def put(self, obj: Resource, fetched: Optional[datetime] = None) -> None:
+        """
+        Adds an object to the cache, discarding the least recently used
+        object if the cache is full. The age of the object is measured
+        from fetched, if given, otherwise from the current time.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._objs[obj.resource_uri.uri] = (obj, fetched if fetched is not None else datetime.now())
+            self._objs.move_to_end(obj.resource_uri.uri)
+            while len(self._objs) > self.max_size:
+                self._objs.popitem(last=False)
+
+
+    def clear(self) -> None:
+        """
+        Removes all objects from the cache, and resets the counters.
+        """
+        with self._lock:
+            self._objs.clear()
+            self.hits   = 0
+            self.misses = 0
+
+
+    def discard(self, uri: str) -> None:
+        """
+        Removes the object with the specified URI from the cache, if present.
+        """
+        with self._lock:
+            self._objs.pop(uri, None)
+
+
+# =================================================================================================================================
+# Classes to support incremental synchronisation with the Datatracker:
+
+# The endpoints that can be synchronised, for each type of object. These are
+# the objects that have a "time" field, recording when they were last changed,
+# that can be used to filter list queries.
+SYNC_ENDPOINTS = {
+    BallotDocumentEvent      : "/api/v1/doc/ballotdocevent/",
+    Document                 : "/api/v1/doc/document/",
+    DocumentEvent            : "/api/v1/doc/docevent/",
+    Email                    : "/api/v1/person/email/",
+    Group                    : "/api/v1/group/group/",
+    MailingListSubscriptions : "/api/v1/mailinglists/subscribed/",
+    Person                   : "/api/v1/person/person/",
+    PersonEvent              : "/api/v1/person/personevent/",
+    SubmissionEvent          : "/api/v1/submit/submissionevent/",
+} # type: Dict[Type[Resource], str]
+
+
+@dataclass(frozen=True)
+class SyncSummary:
+    changed : Dict[str, List[str]]   # The URIs of the objects that changed, for each endpoint
+    marks   : Dict[str, str]         # The timestamp of the most recent change seen, for each endpoint
+
+    def total(self) -> int:
+        """
+        The number of objects that changed, across all endpoints.
+        """
+        return sum(len(uris) for uris in self.changed.values())
+
+
+class Checkpoint:
+    """
+    A file recording the progress of list queries, so that a query that was
+    interrupted (e.g., by a crash, or by a failure of the datatracker) can be
+    resumed from where it stopped, rather than from the first page. For each
+    incomplete query, the file records the position of the next page of
+    results that has not been consumed: its offset or, for queries using
+    keyset paging, the id of the last object consumed. The entry for a query
+    is removed once all of its results have been consumed. The file is
+    replaced atomically each time it changes, so is never left partially
+    written.
+    """
+    def __init__(self, path: Path) -> None:
+        self.path  = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as inf:
+                self._positions = json.load(inf) # type: Dict[str, int]
+        except FileNotFoundError:
+            self._positions = {}
+
+
+    def position(self, query_key: str) -> Optional[int]:
+        """
+        Returns the position at which to resume the specified query, or None
+        if the query should start from the beginning.
+        """
+        with self._lock:
+            return self._positions.get(query_key)
+
+
+    def update(self, query_key: str, position: Optional[int]) -> None:
+        """
+        Records the position of the next page of results of the specified
+        query, or that the query is complete, if position is None.
+        """
+        with self._lock:
+            if position is None:
+                self._positions.pop(query_key, None)
+            else:
+                self._positions[query_key] = position
+            with replace_file(self.path, "w") as outf:
+                json.dump(self._positions, outf, indent=2)
+
+
+# =================================================================================================================================
+# Classes to limit the rate of requests to the Datatracker, and to retry
+# requests that fail:
+
+class _TokenBucket:
+    """
+    A token-bucket rate limiter, shared by all threads using a DataTracker.
+    Tokens are added at rate per second, up to burst tokens, and each request
+    takes one token, waiting until one is available. If rate is None, requests
+    are not limited. The bucket can also be paused, to make every thread back
+    off when the datatracker indicates that it is overloaded.
+    """
+    def __init__(self, rate: Optional[float], burst: int) -> None:
+        self.rate          = rate
+        self.burst         = burst
+        self._lock         = threading.Lock()
+        self._tokens       = float(burst)
+        self._updated      = time.monotonic()
+        self._paused_until = 0.0
+
+
+    def acquire(self) -> None:
+        """
+        Takes a token from the bucket, waiting until one is available.
+        """
+        with self._lock:
+            now  = time.monotonic()
+            wait = self._paused_until - now
+            if self.rate is not None:
+                # Reserve a token, allowing the bucket to go into debt, so that
+                # threads waiting for a token are served in turn.
+                self._tokens  = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                wait = max(wait, -self._tokens / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+
+
+    def pause(self, seconds: float) -> None:
+        """
+        Prevents any tokens being taken for the specified number of seconds.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+# The HTTP status codes with which the datatracker indicates that it is
+# overloaded, or that requests are being made too quickly. Requests that
+# receive these responses are retried, after all threads wait for the time
+# given in the Retry-After header or, if none, for a backoff time.
+BACKOFF_STATUS = {429, 503}
+
+# The HTTP status codes indicating a transient failure of the datatracker, or
+# of a proxy in front of it. Requests that receive these responses, or that
+# fail with a connection error, are retried by the same thread after waiting
+# for a backoff time.
+RETRY_STATUS = {500, 502, 504}
+
+# The backoff time is chosen at random, between zero and an exponentially
+# increasing maximum (1, 2, 4, ... seconds, up to BACKOFF_MAX), so that the
+# threads, and other clients, that failed at the same time do not all retry
+# at the same time. Longer Retry-After times are also limited to BACKOFF_MAX,
+# so that a misconfigured server cannot stall every thread indefinitely.
+BACKOFF_MAX = 60.0
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0.0, min(BACKOFF_MAX, 2.0 ** attempt))
+
+
+def _retry_after(response: Response) -> Optional[float]:
+    # Returns the number of seconds given by the Retry-After header of a
+    # response, which can be a number of seconds or an HTTP date, limited to
+    # at most BACKOFF_MAX, or None if the header is missing or invalid.
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(BACKOFF_MAX, max(0.0, seconds))
+
+
+class _Counter:
+    """
+    A counter that can be incremented from several threads.
+    """
+    def __init__(self) -> None:
+        self._lock  = threading.Lock()
+        self._value = 0
+
+
+    def increment(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+# =================================================================================================================================
+# Helper functions:
+
+def _keyset_pageable(obj_type: Type[Resource]) -> bool:
+    # Returns True if list queries for obj_type can be paged using "id__gt",
+    # since the objects have a numeric id.
+    return any(f.name == "id" and f.type is int for f in fields(obj_type))
+
+
+def _canonical_uri(uri: str) -> str:
+    # The datatracker accepts object URIs with or without a trailing slash,
+    # but always includes the slash in the URIs it returns.
+    if uri.endswith("/"):
+        return uri
+    else:
+        return uri + "/"
+
+
+def _uri_type(field_type: Any) -> Optional[Type[URI]]:
+    # The URI type referenced by a field of type X, Optional[X], or List[X],
+    # where X is a subclass of URI, or None if the field is not a reference.
+    args = getattr(field_type, "__args__", None)
+    if args is not None:
+        field_type = args[0]
+    if isinstance(field_type, type) and issubclass(field_type, URI):
+        return field_type
+    return None
+
+
+def _resource_type(uri_type: Type[URI]) -> Optional[Type[Resource]]:
+    # The Resource type that is identified by URIs of the specified type. The
+    # classes replaced by _slotted() can remain in __subclasses__() until they
+    # are garbage collected, so are skipped.
+    for resource_type in Resource.__subclasses__():
+        if "__slots__" in resource_type.__dict__ and resource_type.__annotations__.get("resource_uri") is uri_type:
+            return resource_type
+    return None
+
+
+# ---------------------------------------------------------------------------------------------------------------------------------
+# Decoders to convert JSON objects into Resource objects:
+#
+# Pavlova inspects the type of every field, and dispatches to a parser for
+# that type, each time an object is parsed. The functions here do that once
+# for each Resource type, and generate a function that converts a JSON
+# object directly into the dataclass. If the generated function fails, for
+# example because a field is missing or a timestamp is in an unexpected
+# format, the object is parsed by Pavlova instead, so that the results and
+# the errors raised match those from Pavlova.
+
+def _decode_bool(value: Any) -> bool:
+    # As pavlova.parsers.BoolParser
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.lower() in ('yes', 'true', '1'):
+            return True
+        if value.lower() in ('no', 'false', '0'):
+            return False
+        raise TypeError("{} is not a valid boolean value".format(value))
+    return bool(value)
+
+
+def _field_decoder(field_type: Any, intern: bool = True) -> Any:
+    # A function that converts a JSON value into a value of field_type. URIs
+    # are interned, if intern is True.
+    if field_type is datetime:
+        return datetime.fromisoformat
+    if field_type is bool:
+        return _decode_bool
+    if field_type in (str, int, float):
+        return field_type
+    if isinstance(field_type, type) and issubclass(field_type, URI):
+        def decode_uri(value: Any) -> URI:
+            return _intern_uri(field_type, value)
+        def decode_uri_unique(value: Any) -> URI:
+            uri = field_type(value, _NO_PARAMS) # type: URI
+            return uri
+        return decode_uri if intern else decode_uri_unique
+    origin = getattr(field_type, "__origin__", None)
+    args   = getattr(field_type, "__args__", ()) # type: Tuple[Any, ...]
+    if origin is list:
+        decode_item = _field_decoder(args[0])
+        def decode_list(value: Any) -> List[Any]:
+            if not isinstance(value, list):
+                raise TypeError("{} is not a list".format(value))
+            return [decode_item(item) for item in value]
+        return decode_list
+    if origin is Union and len(args) == 2 and args[1] is type(None):
+        decode_value = _field_decoder(args[0])
+        def decode_optional(value: Any) -> Any:
+            return None if value is None else decode_value(value)
+        return decode_optional
+    raise TypeError("Cannot decode field of type {}".format(field_type))
+
+
+def _compile_decoder(obj_type: Type[T]) -> Callable[[Dict[str, Any]], T]:
+    # Generate a function that converts a JSON object into an obj_type. The
+    # resource_uri of each object is unique, so is not interned.
+    namespace = {"obj_type": obj_type}  # type: Dict[str, Any]
+    args      = []
+    for i, f in enumerate(fields(obj_type)):
+        if f.init:
+            namespace["decode_{}".format(i)] = _field_decoder(f.type, f.name != "resource_uri")
+            args.append("{0}=decode_{1}(obj_json[{0!r}])".format(f.name, i))
+    source = "def decode(obj_json):\n    return obj_type({})\n".format(", ".join(args))
+    exec(source, namespace)
+    return cast(Callable[[Dict[str, Any]], T], namespace["decode"])
+
+
+_decoders = {} # type: Dict[Type[Resource], Optional[Callable[[Dict[str, Any]], Resource]]]
+
+def _decoder(obj_type: Type[T]) -> Optional[Callable[[Dict[str, Any]], T]]:
+    # The decoder for obj_type, compiled when the type is first used, or None
+    # if obj_type has fields of a type that cannot be compiled.
+    if obj_type not in _decoders:
+        try:
+            _decoders[obj_type] = _compile_decoder(obj_type)
+        except TypeError:
+            _decoders[obj_type] = None
+    return cast(Optional[Callable[[Dict[str, Any]], T]], _decoders[obj_type])
+
+
+# ---------------------------------------------------------------------------------------------------------------------------------
+# Lazily decoded objects:
+#
+# A lazy object is an instance of a subclass of a Resource type that holds the
+# JSON values of its fields, and decodes each field when first accessed,
+# storing the result in the slot for that field. The subclass overrides each
+# field with a descriptor that does this. The fields of an object that are
+# never accessed are never decoded. The JSON values are held in a list, in the
+# order of the fields, rather than in the much larger JSON object. Each value
+# is discarded once it has been decoded, and the list once every value has
+# been, so the JSON is not held alongside the decoded values. The checks in
+# __post_init__() are not run for lazy objects.
+
+_MISSING = object()
+
+class _LazyField:
+    def __init__(self, name: str, index: int, field_type: Any, slot: Any, decode: Callable[[Any], Any]) -> None:
+        self.name       = name
+        self.index      = index
+        self.field_type = field_type
+        self.slot       = slot
+        self.decode     = decode
+
+
+    def __get__(self, obj: Any, owner: Any = None) -> Any:
+        if obj is None:
+            return self
+        try:
+            return self.slot.__get__(obj, owner)
+        except AttributeError:
+            pass
+        values = obj._json
+        value  = _MISSING if values is None else values[self.index]
+        if value is _MISSING:
+            # The field may have been decoded by another thread, since the slot
+            # was checked. Otherwise, it is missing from the JSON, which is a
+            # TypeError when decoding a non-lazy object.
+            try:
+                return self.slot.__get__(obj, owner)
+            except AttributeError:
+                raise TypeError("{} is missing field '{}'".format(obj._lazy_base.__name__, self.name)) from None
+        try:
+            value = self.decode(value)
+        except (ValueError, TypeError):
+            # Parse the field using Pavlova, to match the non-lazy results
+            try:
+                value = obj._pavlova.parse_field(value, self.field_type, (self.name,))
+            except (ValueError, TypeError) as exc:
+                raise PavlovaParsingError(str(exc), exc, (self.name,), self.field_type) from exc
+        # The JSON value is only discarded once the decoded value is in the
+        # slot, so another thread never sees neither, and the list is only
+        # discarded once every value in it has been.
+        self.slot.__set__(obj, value)
+        values[self.index] = _MISSING
+        if all(v is _MISSING for v in values):
+            object.__setattr__(obj, "_json", None)
+        return value
+
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        # Used by __init__() and unpickling. The dataclass __setattr__()
+        # prevents other assignments.
+        self.slot.__set__(obj, value)
+
+
+def _rebuild(cls: Type[Resource], state: List[Any]) -> Resource:
+    obj = object.__new__(cls)
+    _setstate(obj, state)
+    return obj
+
+
+def _lazy_reduce(self: Any) -> Any:
+    # Lazy objects are pickled as the equivalent non-lazy object.
+    return (_rebuild, (self._lazy_base, _getstate(self)))
+
+
+_lazy_classes = {} # type: Dict[Type[Resource], Type[Resource]]
+
+def _lazy_class(obj_type: Type[T]) -> Type[T]:
+    # The lazy subclass of obj_type, created when first used.
+    if obj_type not in _lazy_classes:
+        cls_dict = {
+            "__slots__"    : ("_json", "_pavlova"),
+            "__reduce__"   : _lazy_reduce,
+            "_lazy_base"   : obj_type,
+            "_lazy_fields" : tuple(f.name for f in fields(obj_type)),
+        } # type: Dict[str, Any]
+        for index, f in enumerate(fields(obj_type)):
+            slot = next(base.__dict__[f.name] for base in obj_type.__mro__ if f.name in base.__dict__)
+            cls_dict[f.name] = _LazyField(f.name, index, f.type, slot, _field_decoder(f.type, f.name != "resource_uri"))
+        _lazy_classes[obj_type] = type("Lazy" + obj_type.__name__, (obj_type,), cls_dict)
+    return cast(Type[T], _lazy_classes[obj_type])
+
+
+def _lazy_object(obj_type: Type[T], obj_json: Dict[str, Any], pavlova: Pavlova) -> T:
+    cls = _lazy_class(obj_type)
+    obj = object.__new__(cls)
+    object.__setattr__(obj, "_json", [obj_json.get(name, _MISSING) for name in cls._lazy_fields]) # type: ignore
+    object.__setattr__(obj, "_pavlova", pavlova)
+    return obj
+
+
+# ---------------------------------------------------------------------------------------------------------------------------------
+# Rows holding selected fields of an object:
+
+_row_types = {} # type: Dict[Tuple[Type[Resource], Tuple[str, ...]], Any]
+
+def _row_type(obj_type: Type[Resource], field_names: Tuple[str, ...]) -> Any:
+    # The named tuple type holding the named fields of an obj_type.
+    key = (obj_type, field_names)
+    if key not in _row_types:
+        _row_types[key] = namedtuple(obj_type.__name__ + "Row", field_names)
+    return _row_types[key]
+
+
+def _compile_row_decoder(obj_type: Type[Resource], field_names: Tuple[str, ...], as_dict: bool) -> Callable[[Dict[str, Any]], Any]:
+    # Generate a function that converts a JSON object into a named tuple, or
+    # a dict, holding the named fields of an obj_type, without constructing
+    # the obj_type.
+    field_types = {f.name: f.type for f in fields(obj_type)}
+    for name in field_names:
+        if name not in field_types:
+            raise ValueError("Unknown field '{}' of {}".format(name, obj_type.__name__))
+    namespace = {"Row": _row_type(obj_type, field_names)}  # type: Dict[str, Any]
+    values    = []
+    for i, name in enumerate(field_names):
+        namespace["decode_{}".format(i)] = _field_decoder(field_types[name], name != "resource_uri")
+        values.append("decode_{0}(obj_json[{1!r}])".format(i, name))
+    if as_dict:
+        source = "def decode(obj_json):\n    return {{{}}}\n".format(", ".join("{!r}: {}".format(n, v) for n, v in zip(field_names, values)))
+    else:
+        source = "def decode(obj_json):\n    return Row({})\n".format(", ".join(values))
+    exec(source, namespace)
+    return cast(Callable[[Dict[str, Any]], Any], namespace["decode"])
+
+
+_row_decoders = {} # type: Dict[Tuple[Type[Resource], Tuple[str, ...], bool], Callable[[Dict[str, Any]], Any]]
+
+def _row_decoder(obj_type: Type[Resource], field_names: Tuple[str, ...], as_dict: bool) -> Callable[[Dict[str, Any]], Any]:
+    key = (obj_type, field_names, as_dict)
+    if key not in _row_decoders:
+        _row_decoders[key] = _compile_row_decoder(obj_type, field_names, as_dict)
+    return _row_decoders[key]
+
+
 # =================================================================================================================================
 # A class to represent the datatracker:
 
 class DataTracker:
     """
     A class for interacting with the IETF DataTracker.
+
+    A DataTracker can be used from several threads at once. By default, each
+    thread makes its requests using its own requests.Session, and the sessions
+    share a pool of up to pool_size persistent connections to the datatracker
+    (see HTTPTransport). The objects that are returned are immutable, and the
+    caches are thread-safe.
     """
-    def __init__(self, cache_dir: Optional[Path] = None):
+    def __init__(self,
+                 cache_dir         : Optional[Path] = None,
+                 page_workers      : int = 1,
+                 prefetch_pages    : int = 0,
+                 cache             : Optional[DataTrackerCache] = None,
+                 memory_cache_size : int = 10000,
+                 query_ttl         : Optional[timedelta] = None,
+                 cache_ttl         : Optional[Dict[Type[URI], Optional[timedelta]]] = None,
+                 lazy              : bool = False,
+                 pool_size         : int = 10,
+                 rate_limit        : Optional[float] = None,
+                 rate_burst        : int = 10,
+                 conn_max_requests : int = 99,
+                 conn_max_age      : Optional[timedelta] = None,
+                 max_retries       : int = 5,
+                 keyset_paging     : bool = False,
+                 transport         : Optional[Transport] = None,
+                 base_url          : str = "https://datatracker.ietf.org"):
         """
         Parameters:
-            cache_dir      -- If set, use this directory as a cache for Datatracker objects
+            cache_dir         -- If set, use this directory as a cache for Datatracker objects
+            page_workers      -- The number of pages of results from a list query that
+                                 can be fetched in parallel. If greater than 1, the pages
+                                 are requested by offset, once the first page has shown
+                                 the total number of results.
+            prefetch_pages    -- If greater than 0, and page_workers is 1, fetch pages of
+                                 results from a list query in a background thread, while
+                                 the objects on the current page are being processed. Up
+                                 to this many pages are fetched ahead of the caller.
+            cache             -- If set, use this to cache Datatracker objects, rather
+                                 than a FileCache in cache_dir (e.g., an SQLiteCache)
+            memory_cache_size -- The number of parsed objects to hold in memory, in front
+                                 of the cache, so that frequently used objects are not
+                                 decoded repeatedly. Set to 0 to disable. The hit and
+                                 miss counts are available in memory_cache.hits/misses.
+            query_ttl         -- If set, the results of list queries are held in the cache
+                                 for this long, and repeated queries are answered from the
+                                 cached objects rather than by the datatracker.
+            cache_ttl         -- The time for which cached objects are fresh, by URI type,
+                                 overriding the defaults in CACHE_TTL. Stale objects are
+                                 revalidated with a conditional request when retrieved
+                                 individually, or fetched in bulk by resolve_many().
+            lazy              -- If True, return objects that decode each field when it is
+                                 first accessed, rather than when the object is retrieved.
+                                 This is faster when only some fields of each object are
+                                 used. The objects are instances of a subclass of the usual
+                                 type (e.g., of Document).
+            pool_size         -- The number of persistent connections to the datatracker
+                                 that can be open at once, shared by all threads using
+                                 this DataTracker. Threads wait for a connection if all
+                                 are in use. This should be at least page_workers. This,
+                                 and the conn_max_ parameters, configure the default
+                                 HTTPTransport, and are ignored if transport is set.
+            rate_limit        -- If set, the maximum average number of requests per second
+                                 to make to the datatracker, across all threads.
+            rate_burst        -- The number of requests that can be made in a burst, faster
+                                 than rate_limit, after a period with fewer requests.
+            conn_max_requests -- The number of requests to make on a connection before it
+                                 is closed and reopened. The datatracker closes connections
+                                 on which more than 100 requests are made.
+            conn_max_age      -- If set, connections that have been open for longer than
+                                 this are closed and reopened before their next request.
+            max_retries       -- The number of times to retry a request that fails with a
+                                 connection error, or a response with a status code in
+                                 BACKOFF_STATUS or RETRY_STATUS, waiting for a random and
+                                 exponentially increasing time before each retry.
+            keyset_paging     -- If True, list queries for objects with a numeric id are
+                                 ordered by id, and each page requests the objects with
+                                 an id greater than the last on the previous page, rather
+                                 than requesting pages by offset. The cost of each page
+                                 does not grow with its depth, and objects added while a
+                                 query is in progress cannot cause others to be skipped
+                                 or returned twice. The results are returned in order of
+                                 id, and the pages are fetched one at a time, although
+                                 prefetch_pages still applies.
+            transport         -- If set, make requests using this transport, rather than
+                                 an HTTPTransport (e.g., a RecordingTransport to record
+                                 the responses, or a ReplayTransport to use recorded
+                                 responses without contacting the datatracker).
+            base_url          -- The URL of the datatracker (e.g., to use a TastypieServer
+                                 serving recorded objects, rather than the datatracker).
         """
-        self.session  = requests.Session()
         self.ua       = "glasgow-ietfdata/0.2.0"          # Update when making a new relaase
-        self.base_url = "https://datatracker.ietf.org"
-        self.http_req = 0
+        self.base_url = base_url
+        if transport is None:
+            transport = HTTPTransport(max(pool_size, page_workers, 1), conn_max_requests,
+                                      None if conn_max_age is None else conn_max_age.total_seconds())
+        self.transport = transport
+        # Views created by raw() and checkpoint() share the transport, and must
+        # not close it, so only the DataTracker that created it is its owner:
+        self._owns_transport = True
+        if isinstance(transport, HTTPTransport):
+            self.session = transport.session()
+        else:
+            self.session = requests.Session()
+        self._limiter  = _TokenBucket(rate_limit, rate_burst)
+        self._requests = _Counter()
+        self.max_retries = max_retries
         self.cache_dir = cache_dir
+        if cache is None and cache_dir is not None:
+            cache = FileCache(cache_dir)
+        self.cache = cache
+        self.page_workers = page_workers
+        self.prefetch_pages = prefetch_pages
+        self.keyset_paging  = keyset_paging
+        self.memory_cache = MemoryCache(memory_cache_size)
+        self.query_ttl    = query_ttl
+        self.lazy         = lazy
+        # Raw mode settings, used by views created by raw():
+        self._raw_fields  = None  # type: Optional[Tuple[str, ...]]
+        self._raw_cache   = False
+        self._raw_as_dict = False
+        # The checkpoint used by views created by checkpoint():
+        self._checkpoint  = None  # type: Optional[Checkpoint]
+        self.cache_ttl    = dict(CACHE_TTL)
+        if cache_ttl is not None:
+            self.cache_ttl.update(cache_ttl)
         self.pavlova = Pavlova()
         # Please sort the following alphabetically:
         self.pavlova.register_parser(BallotDocumentEventURI, GenericParser(self.pavlova, BallotDocumentEventURI))
@@ -832,78 +1880,671 @@ class DataTracker:
 
 
     def __del__(self):
-        self.session.close()
+        self.close()
 
 
-    def _cache_filepath(self, resource_uri: URI) -> Path:
-        assert self.cache_dir is not None
-        return Path(self.cache_dir, resource_uri.uri[1:-1] + ".json")
+    def close(self) -> None:
+        """
+        Closes the connections to the datatracker. This has no effect on views
+        created by raw() or checkpoint(), which share the connections of the
+        DataTracker they were created from.
+        """
+        if self._owns_transport:
+            self.transport.close()
 
 
-    def _obj_is_cached(self, resource_uri: URI) -> bool:
-        if self.cache_dir is None:
-            return False
-        return self._cache_filepath(resource_uri).exists()
+    @property
+    def http_req(self) -> int:
+        """
+        The number of HTTP requests made to the datatracker, by all threads.
+        """
+        return self._requests.value
+
+
+    def _decode(self, obj_json: Dict[str, Any], obj_type: Type[T]) -> T:
+        # Convert a JSON object into an obj_type, using the compiled decoder
+        # for that type, falling back to Pavlova if the decoder fails.
+        if self.lazy:
+            return _lazy_object(obj_type, obj_json, self.pavlova)
+        decoder = _decoder(obj_type)
+        if decoder is not None:
+            try:
+                return decoder(obj_json)
+            except (KeyError, ValueError, TypeError):
+                pass
+        obj = self.pavlova.from_mapping(obj_json, obj_type) # type: T
+        return obj
+
+
+    def _ttl(self, obj_type: Type[Resource]) -> Optional[timedelta]:
+        # The time for which objects of obj_type are fresh, found from the
+        # type of their resource_uri field.
+        uri_type = {f.name: f.type for f in fields(obj_type)}["resource_uri"]
+        if isinstance(uri_type, type):
+            for t in uri_type.__mro__:
+                if t in self.cache_ttl:
+                    return self.cache_ttl[t]
+        return None
+
+
+    def _is_fresh(self, entry: CacheEntry, obj_type: Type[Resource]) -> bool:
+        ttl = self._ttl(obj_type)
+        return ttl is None or datetime.now() - entry.fetched < ttl
+
+
+    def _retrieve_from_cache(self, resource_uri: URI) -> Optional[CacheEntry]:
+        if self.cache is None:
+            return None
+        return self.cache.get(_canonical_uri(resource_uri.uri))
+
+
+    def _cache_obj(self, resource_uri: URI, obj_json: Dict[Any, Any], etag: Optional[str] = None) -> None:
+        if self.cache is not None:
+            self.cache.put(_canonical_uri(resource_uri.uri), obj_json, etag)
 
 
-    def _retrieve_from_cache(self, resource_uri: URI) -> Dict[Any, Any]:
-        obj_json = {}
-        with open(self._cache_filepath(resource_uri)) as cache_file:
-            obj_json = json.load(cache_file)
-        return obj_json
+    def _cache_objs(self, objs: List[Tuple[URI, Dict[Any, Any]]]) -> None:
+        if self.cache is not None:
+            self.cache.put_many([(_canonical_uri(resource_uri.uri), obj_json) for resource_uri, obj_json in objs])
 
 
-    def _cache_obj(self, resource_uri: URI, obj_json: Dict[Any, Any]) -> None:
-        if self.cache_dir is not None:
-            cache_filepath = self._cache_filepath(resource_uri)
-            cache_filepath.parent.mkdir(parents=True, exist_ok=True)
-            with open(cache_filepath, "w") as cache_file:
-                json.dump(obj_json, cache_file)
+    def _remember(self, obj: Resource, fetched: Optional[datetime] = None) -> None:
+        self.memory_cache.put(obj, fetched)
 
 
-    def _rate_limit(self) -> None:
-        # A trivial rate limiter. Called before every HTTP GET to the datatracker.
-        # The datatracker objects if more than 100 requests are made on a single
-        # persistent HTTP connection.
-        self.http_req += 1
-        if (self.http_req % 100) == 0:
-            self.session.close()
+    def _remembered(self, resource_uri: URI, obj_type: Type[T]) -> Optional[T]:
+        if len(resource_uri.params) != 0:
+            return None
+        return self.memory_cache.get(_canonical_uri(resource_uri.uri), obj_type, self._ttl(obj_type))
+
+
+    def _get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        # Make an HTTP GET request to the datatracker. Called by every thread
+        # that fetches from the datatracker, so must be thread-safe. Requests
+        # that fail are retried up to max_retries times. If the datatracker is
+        # overloaded, all threads back off before retrying.
+        attempt = 0
+        while True:
+            self._limiter.acquire()
+            self._requests.increment()
+            try:
+                r = self.transport.get(url, params, headers)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            if attempt == self.max_retries:
+                return r
+            elif r.status_code in BACKOFF_STATUS:
+                delay = _retry_after(r)
+                self._limiter.pause(_backoff(attempt) if delay is None else delay)
+            elif r.status_code in RETRY_STATUS:
+                time.sleep(_backoff(attempt))
+            else:
+                return r
+            attempt += 1
 
 
     def _retrieve(self, resource_uri: URI, obj_type: Type[T]) -> Optional[T]:
         headers = {'User-Agent': self.ua}
-        if self._obj_is_cached(resource_uri):
-            obj_json = self._retrieve_from_cache(resource_uri)
+        remembered = self._remembered(resource_uri, obj_type)
+        if remembered is not None:
+            return remembered
+        entry   = self._retrieve_from_cache(resource_uri)
+        fetched = None # type: Optional[datetime]
+        if entry is not None and self._is_fresh(entry, obj_type):
+            obj_json = entry.obj_json
+            fetched  = entry.fetched
         else:
-            self._rate_limit()
-            r = self.session.get(self.base_url + resource_uri.uri, params=resource_uri.params, headers=headers, verify=True, stream=False)
-            if r.status_code == 200:
-                obj_json = r.json()
-                self._cache_obj(resource_uri, obj_json)
+            if entry is not None:
+                # The cached object is stale: revalidate it with a conditional
+                # request, so it is only sent again if it has changed.
+                headers['If-Modified-Since'] = formatdate(entry.fetched.timestamp(), usegmt=True)
+                if entry.etag is not None:
+                    headers['If-None-Match'] = entry.etag
+            r = self._get(self.base_url + resource_uri.uri, params=resource_uri.params, headers=headers)
+            if r.status_code == 304 and entry is not None:
+                obj_json = entry.obj_json
+                self._cache_obj(resource_uri, obj_json, entry.etag)
+            elif r.status_code == 200:
+                obj_json = _json_loads(r.content)
+                self._cache_obj(resource_uri, obj_json, r.headers.get('ETag'))
             else:
                 print("_retrieve failed: {} {}".format(r.status_code, self.base_url + resource_uri.uri))
                 return None 
-        obj = self.pavlova.from_mapping(obj_json, obj_type) # type: T
+        obj = self._decode(obj_json, obj_type)
+        if len(resource_uri.params) == 0:
+            self._remember(obj, fetched)
         return obj
 
-    def _retrieve_multi(self, resource_uri: URI, obj_type: Type[T]) -> Iterator[T]:
-        resource_uri.params["limit"] = "100"
+
+    def _retrieve_page(self, resource_uri: URI) -> Dict[Any, Any]:
+        # Fetch a single page of results from a list query. Returns the
+        # decoded page, containing "meta" and "objects". If the request
+        # fails, after any retries, an HTTPError is raised, rather than
+        # silently ending the results of the query.
+        headers = {'user-agent': self.ua}
+        r = self._get(self.base_url + resource_uri.uri, params=resource_uri.params, headers=headers)
+        if r.status_code != 200:
+            raise requests.HTTPError("_retrieve_multi failed: {} {}".format(r.status_code, self.base_url + resource_uri.uri), response=r)
+        page = _json_loads(r.content) # type: Dict[Any, Any]
+        return page
+
+
+    def _retrieve_pages(self, resource_uri: URI) -> Iterator[Dict[Any, Any]]:
+        # Fetch the pages of a list query in order, following the "next"
+        # link in each page to find the following page.
         while resource_uri.uri is not None:
-            headers = {'user-agent': self.ua}
-            self._rate_limit()
-            r = self.session.get(self.base_url + resource_uri.uri, params=resource_uri.params, headers=headers, verify=True, stream=False)
-            if r.status_code == 200:
-                meta = r.json()['meta']
-                objs = r.json()['objects']
-                resource_uri  = URI(meta['next'])
-                for obj_json in objs:
-                    obj = self.pavlova.from_mapping(obj_json, obj_type) # type: T
-                    self._cache_obj(obj.resource_uri, obj_json)
-                    yield obj
-            else:
-                print("_retrieve_multi failed: {}".format(r.status_code))
-                print(r.status_code)
+            page = self._retrieve_page(resource_uri)
+            resource_uri = URI(page['meta']['next'])
+            yield page
+
+
+    def _retrieve_pages_parallel(self, resource_uri: URI) -> Iterator[Dict[Any, Any]]:
+        # Fetch the pages of a list query using several worker threads. The
+        # first page gives the total number of results, from which the offset
+        # of every other page can be calculated and those pages requested in
+        # parallel. The pages are returned in order. At most two pages per
+        # worker are in progress or waiting to be consumed at once.
+        first = self._retrieve_page(resource_uri)
+        yield first
+        meta = first['meta']
+        if meta['next'] is None:
+            return None
+        limit   = int(meta['limit'])
+        offsets = range(int(meta['offset']) + limit, int(meta['total_count']), limit)
+        pending = deque() # type: Deque[Future[Dict[Any, Any]]]
+        executor = ThreadPoolExecutor(max_workers=self.page_workers)
+        try:
+            for offset in offsets:
+                params = dict(resource_uri.params)
+                params["offset"] = str(offset)
+                pending.append(executor.submit(self._retrieve_page, URI(resource_uri.uri, params)))
+                if len(pending) >= 2 * self.page_workers:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+    def _retrieve_pages_keyset(self, resource_uri: URI) -> Iterator[Dict[Any, Any]]:
+        # Fetch the pages of a list query ordered by id, requesting each page
+        # after the first using "id__gt" with the id of the last object on the
+        # previous page, rather than by offset.
+        params = resource_uri.params
+        while True:
+            page = self._retrieve_page(URI(resource_uri.uri, params))
+            if len(page['objects']) == 0:
+                return None
+            yield page
+            if page['meta']['next'] is None:
                 return None
+            params = dict(params, id__gt=str(page['objects'][-1]['id']))
+
+
+    def _retrieve_pages_prefetch(self, pages: Iterator[Dict[Any, Any]]) -> Iterator[Dict[Any, Any]]:
+        # Fetch the pages of a list query in a background thread, that runs
+        # ahead of the caller. The queue between the thread and the caller
+        # holds at most prefetch_pages pages, and the thread waits when it
+        # is full. The thread ends when the caller stops iterating.
+        fetched = queue.Queue(maxsize=self.prefetch_pages) # type: queue.Queue[Any]
+        done    = threading.Event()
+        end     = object()
+
+        def put(item: Any) -> bool:
+            while not done.is_set():
+                try:
+                    fetched.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch() -> None:
+            try:
+                for page in pages:
+                    if not put(page):
+                        return
+                put(end)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=fetch, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = fetched.get()
+                if item is end:
+                    return None
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            done.set()
+
+
+    def _query_key(self, resource_uri: URI) -> str:
+        # The key used to cache the results of a list query. The parameters
+        # are sorted, so the key does not depend on the order they were set.
+        params = sorted((k, str(v)) for k, v in resource_uri.params.items())
+        return resource_uri.uri + "?" + urlencode(params)
+
+
+    def _cached_query(self, query_key: str) -> Optional[List[str]]:
+        # Returns the URIs of the results of a list query, if the query is
+        # cached and the cached results are younger than query_ttl.
+        if self.cache is None or self.query_ttl is None:
+            return None
+        entry = self.cache.get_query(query_key)
+        if entry is None or datetime.now() - entry.fetched >= self.query_ttl:
+            return None
+        return entry.uris
+
+
+    def _replay_pages(self, uris: List[str], obj_type: Type[T]) -> Iterator[List[T]]:
+        # Return the results of a cached list query, a page at a time. The
+        # objects are retrieved using resolve_many(), so any that are missing
+        # from the cache are fetched from the datatracker in bulk.
+        for i in range(0, len(uris), 100):
+            objs = self.resolve_many([URI(uri) for uri in uris[i:i+100]], obj_type)
+            yield [obj for obj in objs if obj is not None]
+
+
+    def _retrieve_multi(self,
+                        resource_uri    : URI,
+                        obj_type        : Type[T],
+                        expand          : Optional[List[str]] = None,
+                        use_query_cache : bool = True,
+                        keyset          : Optional[bool] = None) -> Iterator[T]:
+        # Retrieve the results of a list query. The results are paged using
+        # keyset paging if keyset is True, or if keyset is None and the
+        # keyset_paging parameter was set, provided that obj_type has a
+        # numeric id and the query does not specify another order.
+        if keyset is None:
+            keyset = self.keyset_paging
+        if keyset and _keyset_pageable(obj_type) and "order_by" not in resource_uri.params:
+            resource_uri.params["order_by"] = "id"
+        else:
+            keyset = False
+        if self._raw_fields is not None:
+            decode = _row_decoder(obj_type, self._raw_fields, self._raw_as_dict)
+            rows   = self._retrieve_rows(resource_uri, obj_type, self._raw_fields, decode, keyset) # type: Iterator[Any]
+            return rows
+        return self._retrieve_objs(resource_uri, obj_type, expand, use_query_cache, keyset)
+
+
+    def _retrieve_pages_for(self, resource_uri: URI, keyset: bool = False) -> Iterator[Dict[Any, Any]]:
+        if self._checkpoint is not None:
+            return self._retrieve_pages_checkpointed(resource_uri, keyset, self._checkpoint)
+        return self._fetch_pages(resource_uri, keyset)
+
+
+    def _fetch_pages(self, resource_uri: URI, keyset: bool) -> Iterator[Dict[Any, Any]]:
+        if keyset:
+            pages = self._retrieve_pages_keyset(resource_uri)
+            return self._retrieve_pages_prefetch(pages) if self.prefetch_pages > 0 else pages
+        elif self.page_workers > 1:
+            return self._retrieve_pages_parallel(resource_uri)
+        elif self.prefetch_pages > 0:
+            return self._retrieve_pages_prefetch(self._retrieve_pages(resource_uri))
+        else:
+            return self._retrieve_pages(resource_uri)
+
+
+    def _retrieve_pages_checkpointed(self, resource_uri: URI, keyset: bool, checkpoint: Checkpoint) -> Iterator[Dict[Any, Any]]:
+        # Fetch the pages of a list query, starting at the position recorded in
+        # the checkpoint, if any. The position of the next page is recorded once
+        # the caller has consumed each page, and asks for the next.
+        query_key = self._query_key(resource_uri)
+        position  = checkpoint.position(query_key)
+        if position is not None:
+            resume_param = "id__gt" if keyset else "offset"
+            resource_uri = URI(resource_uri.uri, dict(resource_uri.params, **{resume_param: str(position)}))
+        for page in self._fetch_pages(resource_uri, keyset):
+            yield page
+            meta = page['meta']
+            if meta['next'] is None:
+                checkpoint.update(query_key, None)
+            elif keyset:
+                checkpoint.update(query_key, int(page['objects'][-1]['id']))
+            else:
+                checkpoint.update(query_key, int(meta['offset']) + int(meta['limit']))
+
+
+    def _retrieve_rows(self,
+                       resource_uri : URI,
+                       obj_type     : Type[T],
+                       field_names  : Tuple[str, ...],
+                       decode       : Callable[[Dict[str, Any]], Any],
+                       keyset       : bool = False) -> Iterator[Any]:
+        # The results of a list query in raw mode (see raw()). The results
+        # are not decoded into obj_type, are only written to the cache if
+        # requested, and are not held in, or replayed from, the query cache.
+        resource_uri.params["limit"] = "100"
+        for page in self._retrieve_pages_for(resource_uri, keyset):
+            if self._raw_cache:
+                self._cache_objs([(URI(obj_json["resource_uri"]), obj_json) for obj_json in page['objects']])
+            for obj_json in page['objects']:
+                try:
+                    row = decode(obj_json)
+                except (KeyError, ValueError, TypeError):
+                    # Decode the object in full, to match the non-raw results
+                    obj = self._decode(obj_json, obj_type)
+                    values = [getattr(obj, name) for name in field_names]
+                    row = dict(zip(field_names, values)) if self._raw_as_dict else _row_type(obj_type, field_names)(*values)
+                yield row
+
+
+    def _retrieve_objs(self,
+                       resource_uri    : URI,
+                       obj_type        : Type[T],
+                       expand          : Optional[List[str]] = None,
+                       use_query_cache : bool = True,
+                       keyset          : bool = False) -> Iterator[T]:
+        if expand is not None:
+            expand_types = self._expand_types(obj_type, expand)
+        resource_uri.params["limit"] = "100"
+        # A checkpointed query can resume part way through, so its results are
+        # neither replayed from, nor stored in, the query cache.
+        use_query_cache = use_query_cache and self._checkpoint is None
+        query_key   = self._query_key(resource_uri)
+        cached_uris = self._cached_query(query_key) if use_query_cache else None
+        if cached_uris is not None:
+            for cached_objs in self._replay_pages(cached_uris, obj_type):
+                if expand is not None:
+                    self._expand(cached_objs, expand_types)
+                for cached_obj in cached_objs:
+                    yield cached_obj
+            return
+        uris = []  # type: List[str]
+        for page in self._retrieve_pages_for(resource_uri, keyset):
+            objs = [self._decode(obj_json, obj_type) for obj_json in page['objects']]
+            self._cache_objs([(obj.resource_uri, obj_json) for obj, obj_json in zip(objs, page['objects'])])
+            uris.extend(obj.resource_uri.uri for obj in objs)
+            if expand is not None:
+                self._expand(objs, expand_types)
+            for obj in objs:
+                yield obj
+        # The results are only cached once the query has been completed, so
+        # that a partially consumed query is not replayed as if complete.
+        if self.cache is not None and self.query_ttl is not None and use_query_cache:
+            self.cache.put_query(query_key, uris)
+
+
+    def _expand_types(self, obj_type: Type[T], expand: List[str]) -> Dict[str, Type[Resource]]:
+        # Find the type of the objects referenced by each of the fields of
+        # obj_type named in expand. The referenced objects are only useful if
+        # they can be held until the caller asks for them: in the cache, or in
+        # a memory cache that can hold those referenced by a page of results.
+        if self.cache is None and self.memory_cache.max_size < 100 * len(expand):
+            raise ValueError("Cannot expand {} fields without a cache, unless memory_cache_size is at least {}".format(len(expand), 100 * len(expand)))
+        field_types = {f.name: f.type for f in fields(obj_type)}
+        expand_types = {}  # type: Dict[str, Type[Resource]]
+        for name in expand:
+            uri_type = _uri_type(field_types.get(name))
+            resource_type = _resource_type(uri_type) if uri_type is not None else None
+            if resource_type is None:
+                raise ValueError("Cannot expand field '{}' of {}".format(name, obj_type.__name__))
+            expand_types[name] = resource_type
+        return expand_types
+
+
+    def _expand(self, objs: List[T], expand_types: Dict[str, Type[Resource]]) -> None:
+        # Retrieve, using resolve_many(), the objects referenced by the named
+        # fields of objs, so that later requests for them can be answered
+        # without contacting the datatracker. The objects are held in the
+        # memory cache, and stored in the cache if there is one.
+        for name, resource_type in expand_types.items():
+            uris = []  # type: List[URI]
+            for obj in objs:
+                value = getattr(obj, name)
+                if isinstance(value, list):
+                    uris.extend(value)
+                elif value is not None:
+                    uris.append(value)
+            self.resolve_many(uris, resource_type)
+
+
+    def _key_field(self, endpoint: str) -> str:
+        # The field that forms the last component of the URI of an object
+        # retrieved from the specified endpoint (e.g., "/api/v1/person/person/")
+        if endpoint.rsplit("/", 2)[1].startswith("historical"):
+            return "history_id"
+        elif endpoint == "/api/v1/doc/document/" or endpoint == "/api/v1/doc/docalias/":
+            return "name"
+        elif endpoint == "/api/v1/person/email/":
+            return "address"
+        elif endpoint == "/api/v1/doc/statetype/" or endpoint.startswith("/api/v1/name/"):
+            return "slug"
+        else:
+            return "id"
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Retrieving several objects at once:
+
+    def resolve_many(self, resource_uris: Sequence[URI], obj_type: Type[T]) -> List[Optional[T]]:
+        """
+        Retrieve several objects of the same type, given their URIs.
+
+        Objects that are not in the cache are grouped by endpoint and fetched
+        using list queries that filter on the identifier of each object (e.g.,
+        `?id__in=...`), fetching up to 100 objects per request. This is much
+        faster than calling `person()`, `document()`, etc., for each URI. Any
+        objects not returned by those queries are retrieved individually.
+        The objects are held in memory, so that later calls to `person()`,
+        `document()`, etc., for these URIs return without a request.
+
+        Parameters:
+            resource_uris -- The URIs of the objects to retrieve
+            obj_type      -- The type of the objects (e.g., Person)
+
+        Returns:
+            A list containing the object for each of the URIs, in the same
+            order as the URIs, or None where the object could not be found
+        """
+        found   = {}     # type: Dict[str, T]
+        missing = {}     # type: Dict[str, List[str]]
+        fetched = {}     # type: Dict[str, Optional[datetime]]
+        seen    = set()  # type: Set[str]
+        for resource_uri in resource_uris:
+            uri = _canonical_uri(resource_uri.uri)
+            if uri in seen:
+                continue
+            seen.add(uri)
+            remembered = self._remembered(URI(uri), obj_type)
+            cached     = self._retrieve_from_cache(URI(uri)) if remembered is None else None
+            if remembered is not None:
+                found[uri] = remembered
+            elif cached is not None and self._is_fresh(cached, obj_type):
+                found[uri]   = self._decode(cached.obj_json, obj_type)
+                fetched[uri] = cached.fetched
+            else:
+                endpoint, key = uri[:-1].rsplit("/", 1)
+                missing.setdefault(endpoint + "/", []).append(key)
+
+        # The list queries are made using a DataTracker that is not in raw mode,
+        # and does not checkpoint queries, even if this is such a view.
+        plain = self._plain()
+        for endpoint, keys in missing.items():
+            key_filter = self._key_field(endpoint) + "__in"
+            for i in range(0, len(keys), 100):
+                url = URI(endpoint)
+                url.params[key_filter] = ",".join(keys[i:i+100])
+                for obj in plain._retrieve_multi(url, obj_type, use_query_cache=False):
+                    found[obj.resource_uri.uri]   = obj
+                    fetched[obj.resource_uri.uri] = None
+            for key in keys:
+                uri = endpoint + key + "/"
+                if uri not in found:
+                    missing_obj = self._retrieve(URI(uri), obj_type)
+                    if missing_obj is not None:
+                        found[uri] = missing_obj
+
+        # Objects that were already in the memory cache are not added again,
+        # so that their age is unchanged.
+        for uri, when in fetched.items():
+            if uri in found:
+                self._remember(found[uri], when)
+        return [found.get(_canonical_uri(resource_uri.uri)) for resource_uri in resource_uris]
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Raw mode:
+
+    def _plain(self) -> "DataTracker":
+        # This DataTracker, or if this is a view created by raw() or checkpoint(),
+        # a view of the same DataTracker that is in neither raw nor checkpoint mode.
+        if self._raw_fields is None and self._checkpoint is None:
+            return self
+        view = copy.copy(self)
+        view._raw_fields = None
+        view._checkpoint = None
+        return view
+
+
+    def raw(self, field_names: List[str], cache: bool = False, as_dict: bool = False) -> "DataTracker":
+        """
+        Returns a view of this DataTracker in which the methods that return
+        lists of objects (e.g., document_events()) instead return lightweight
+        rows holding only the specified fields of each object. Each row is a
+        named tuple, so the fields can be accessed as attributes in the same
+        way as for the full objects, or a dict if as_dict is True. The full
+        objects are not constructed, so this is much faster when streaming
+        large numbers of objects. The view shares its session and caches with
+        this DataTracker, which must remain open while the view is in use.
+        Methods that return single objects are unchanged.
+
+        For example:
+            for event in dt.raw(["time", "type", "doc"]).document_events():
+                print(event.time, event.type, event.doc)
+
+        Parameters:
+            field_names -- The names of the fields to include in each row
+            cache       -- If True, store the objects in the cache. By default,
+                           objects retrieved in raw mode are not cached.
+            as_dict     -- If True, return each row as a dict rather than a
+                           named tuple
+
+        Returns:
+            A view of this DataTracker, in raw mode
+        """
+        view = copy.copy(self)
+        view._owns_transport = False
+        view._raw_fields  = tuple(field_names)
+        view._raw_cache   = cache
+        view._raw_as_dict = as_dict
+        return view
+
+
+    def checkpoint(self, checkpoint_file: Path) -> "DataTracker":
+        """
+        Returns a view of this DataTracker in which the methods that return
+        lists of objects record their progress in checkpoint_file. If a list
+        query is interrupted, by an exception or by the program stopping, and
+        then repeated using a view with the same checkpoint file, the results
+        resume from the page where they stopped. The page that was in progress
+        is returned again, so some objects may be seen twice. A query is only
+        resumed if it has the same parameters as the one that was interrupted.
+        The results of checkpointed queries are not held in the query cache.
+        The view shares its session and caches with this DataTracker, which
+        must remain open while the view is in use, and can be combined with
+        raw().
+
+        For example:
+            for doc in dt.checkpoint(Path("documents.checkpoint")).documents():
+                process(doc)
+
+        Parameters:
+            checkpoint_file -- The file in which to record the progress of queries
+
+        Returns:
+            A view of this DataTracker, that checkpoints list queries
+        """
+        view = copy.copy(self)
+        view._owns_transport = False
+        view._checkpoint = Checkpoint(checkpoint_file)
+        return view
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Incremental synchronisation:
+
+    def sync(self, resource_types: List[Type[Resource]], state_file: Path) -> SyncSummary:
+        """
+        Fetch the objects of the specified types that have changed since the
+        last call to sync() with this state_file, and store them in the cache.
+        The state file records the timestamp of the most recent change seen
+        for each endpoint (the high-water mark). Only objects with a timestamp
+        at or after that mark are requested. On the first sync, all objects
+        of each type are fetched. The state file is updated as each type is
+        completed, so an interrupted sync resumes from where it stopped. The
+        objects are retrieved in full, even if this is a raw() view.
+
+        Parameters:
+            resource_types -- The types of object to synchronise, which must be
+                              keys of SYNC_ENDPOINTS (e.g., [Person, Document])
+            state_file     -- The file in which to record the high-water marks
+
+        Returns:
+            A SyncSummary listing the URIs of the objects that changed, and the
+            new high-water mark, for each endpoint
+
+        Raises:
+            ValueError, if a type cannot be synchronised, or if the DataTracker
+            has no cache, since the high-water marks would then be advanced
+            past objects that were never stored
+        """
+        if self.cache is None:
+            raise ValueError("sync() requires a cache")
+        for resource_type in resource_types:
+            if resource_type not in SYNC_ENDPOINTS:
+                raise ValueError("Cannot sync {}".format(resource_type.__name__))
+        try:
+            with open(state_file) as inf:
+                state = json.load(inf) # type: Dict[str, Dict[str, Any]]
+        except FileNotFoundError:
+            state = {}
+
+        # The objects are retrieved using a DataTracker that is not in raw mode,
+        # and does not checkpoint queries, even if this is such a view.
+        plain   = self._plain()
+        changed = {} # type: Dict[str, List[str]]
+        for resource_type in resource_types:
+            endpoint  = SYNC_ENDPOINTS[resource_type]
+            prev_mark = state.get(endpoint, {}).get("time")
+            # The objects whose timestamp equals the mark were seen by the previous
+            # sync. They are requested again, since time__gt could miss objects that
+            # changed later within the same second, but are not reported as changed.
+            prev_seen = set(state.get(endpoint, {}).get("uris", []))
+            mark      = prev_mark
+            seen      = set(prev_seen)
+            url = URI(endpoint)
+            if prev_mark is not None:
+                url.params["time__gte"] = prev_mark
+            changed[endpoint] = []
+            for obj in plain._retrieve_multi(url, resource_type, use_query_cache=False):
+                uri      = obj.resource_uri.uri
+                obj_time = getattr(obj, "time").isoformat()
+                if obj_time != prev_mark or uri not in prev_seen:
+                    changed[endpoint].append(uri)
+                    self.memory_cache.discard(uri)
+                if mark is None or obj_time > mark:
+                    mark = obj_time
+                    seen = set()
+                if obj_time == mark:
+                    seen.add(uri)
+            if mark is not None:
+                state[endpoint] = {"time": mark, "uris": sorted(seen)}
+                with replace_file(state_file, "w") as outf:
+                    json.dump(state, outf, indent=2)
+
+        return SyncSummary(changed, {endpoint: state[endpoint]["time"] for endpoint in changed if endpoint in state})
 
 
     # ----------------------------------------------------------------------------------------------------------------------------
@@ -1028,7 +2669,30 @@ class DataTracker:
             since   : str = "1970-01-01T00:00:00",
             until   : str = "2038-01-19T03:14:07",
             doctype : Optional[DocumentType] = None,
-            group   : Optional[Group]        = None) -> Iterator[Document]:
+            group   : Optional[Group]        = None,
+            expand  : Optional[List[str]]    = None) -> Iterator[Document]:
+        """
+        A generator returning information about documents.
+
+        Parameters:
+            since   -- Only return documents with timestamp after this
+            until   -- Only return documents with timestamp before this
+            doctype -- Only return documents of this type
+            group   -- Only return documents from this group
+            expand  -- The names of fields that reference other objects (e.g.,
+                       ["ad", "group", "states"]). The objects referenced by these
+                       fields are retrieved in bulk as each page of results is
+                       received, so that calling `person(doc.ad)`, etc., returns
+                       without making a further request. The objects are held in
+                       the memory cache, and in the cache, if set. Without a cache,
+                       objects discarded from the memory cache before they are used
+                       are fetched again individually, and a ValueError is raised
+                       if the memory cache cannot hold the 100 objects per field
+                       that can be referenced by a page of results.
+
+        Returns:
+           A sequence of Document objects
+        """
         url = DocumentURI("/api/v1/doc/document/")
         url.params["time__gt"] = since
         url.params["time__lt"] = until
@@ -1036,7 +2700,7 @@ class DataTracker:
             url.params["type"] = doctype.slug
         if group is not None:
             url.params["group"] = group.id
-        return self._retrieve_multi(url, Document)
+        return self._retrieve_multi(url, Document, expand)
 
 
     # Datatracker API endpoints returning information about document aliases:
@@ -1199,9 +2863,10 @@ class DataTracker:
     def document_events(self,
                         since      : str = "1970-01-01T00:00:00",
                         until      : str = "2038-01-19T03:14:07",
-                        doc        : Document = None,
-                        by         : Person   = None,
-                        event_type : str      = None) -> Iterator[DocumentEvent]:
+                        doc        : Optional[Document] = None,
+                        by         : Optional[Person]   = None,
+                        event_type : Optional[str]      = None,
+                        expand     : Optional[List[str]] = None) -> Iterator[DocumentEvent]:
         """
         A generator returning information about document events.
 
@@ -1211,6 +2876,8 @@ class DataTracker:
             doc        -- Only return document events for this document
             by         -- Only return document events by this person
             event_type -- Only return document events with this type
+            expand     -- Retrieve the objects referenced by these fields in bulk
+                          (see `documents()`)
 
         Returns:
            A sequence of DocumentEvent objects
@@ -1223,7 +2890,7 @@ class DataTracker:
         if by is not None:
             url.params["by"]   = by.id
         url.params["type"]     = event_type
-        return self._retrieve_multi(url, DocumentEvent)
+        return self._retrieve_multi(url, DocumentEvent, expand)
 
 
     # Datatracker API endpoints returning information about document authorship:
@@ -1231,22 +2898,25 @@ class DataTracker:
     # * https://datatracker.ietf.org/api/v1/doc/documentauthor/?person=...       - documents by person
     # * https://datatracker.ietf.org/api/v1/doc/documentauthor/?email=...        - documents by person
 
-    def document_authors(self, document : Document) -> Iterator[DocumentAuthor]:
+    # The `expand` parameter to these methods names fields that reference other
+    # objects (e.g., ["person", "email"]), and is as described in documents().
+
+    def document_authors(self, document : Document, expand : Optional[List[str]] = None) -> Iterator[DocumentAuthor]:
         url = DocumentAuthorURI("/api/v1/doc/documentauthor/")
         url.params["document"] = document.id
-        return self._retrieve_multi(url, DocumentAuthor)
+        return self._retrieve_multi(url, DocumentAuthor, expand)
 
 
-    def documents_authored_by_person(self, person : Person) -> Iterator[DocumentAuthor]:
+    def documents_authored_by_person(self, person : Person, expand : Optional[List[str]] = None) -> Iterator[DocumentAuthor]:
         url = DocumentAuthorURI("/api/v1/doc/documentauthor/")
         url.params["person"] = person.id
-        return self._retrieve_multi(url, DocumentAuthor)
+        return self._retrieve_multi(url, DocumentAuthor, expand)
 
 
-    def documents_authored_by_email(self, email : Email) -> Iterator[DocumentAuthor]:
+    def documents_authored_by_email(self, email : Email, expand : Optional[List[str]] = None) -> Iterator[DocumentAuthor]:
         url = DocumentAuthorURI("/api/v1/doc/documentauthor/")
         url.params["email"] = email.address
-        return self._retrieve_multi(url, DocumentAuthor)
+        return self._retrieve_multi(url, DocumentAuthor, expand)
 
 
     # Datatracker API endpoints returning information about related documents:
@@ -1359,7 +3029,8 @@ class DataTracker:
                         ballot_type : Optional[BallotType]    = None,
                         event_type  : Optional[str]           = None,
                         by          : Optional[Person]        = None,
-                        doc         : Optional[Document]      = None) -> Iterator[BallotDocumentEvent]:
+                        doc         : Optional[Document]      = None,
+                        expand      : Optional[List[str]]     = None) -> Iterator[BallotDocumentEvent]:
         """
         A generator returning information about ballot document events.
 
@@ -1370,6 +3041,8 @@ class DataTracker:
             event_type   -- Only return ballot document events with this type
             by           -- Only return ballot document events by this person
             doc          -- Only return ballot document events that relate to this document
+            expand       -- Retrieve the objects referenced by these fields in bulk
+                            (see `documents()`)
 
         Returns:
            A sequence of BallotDocumentEvent objects
@@ -1384,7 +3057,7 @@ class DataTracker:
         if doc is not None:
             url.params["doc"] = doc.id
         url.params["type"] = event_type
-        return self._retrieve_multi(url, BallotDocumentEvent)
+        return self._retrieve_multi(url, BallotDocumentEvent, expand)
     
 
     # ----------------------------------------------------------------------------------------------------------------------------
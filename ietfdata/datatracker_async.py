@@ -0,0 +1,519 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# The module contains an asyncio interface to the IETF Datatracker.
+#
+# The AsyncDataTracker class mirrors the DataTracker class in datatracker.py,
+# and returns the same types, but its methods are coroutines (for methods that
+# return a single object) or asynchronous iterators (for methods that return a
+# sequence of objects). The HTTP requests are made by a pool of worker threads
+# wrapping a DataTracker instance, so any number of requests can be awaited at
+# once, with at most `max_concurrency` of them in progress at any time. The
+# on-disk cache is that of the wrapped DataTracker, and has the same layout.
+#
+# For example:
+#
+#   async def main():
+#       async with AsyncDataTracker(cache_dir=Path("cache")) as dt:
+#           people = await asyncio.gather(*[dt.person(uri) for uri in uris])
+#           async for event in dt.document_events(since="2020-01-01T00:00:00"):
+#               ...
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools          import islice
+from pathlib            import Path
+from typing             import Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence, Type, TypeVar
+
+import asyncio
+import copy
+
+from ietfdata.datatracker import *
+
+R = TypeVar('R')
+
+# =================================================================================================================================
+# A class to represent the datatracker, using asyncio:
+
+class AsyncDataTracker:
+    """
+    A class for interacting with the IETF DataTracker using asyncio.
+    """
+    def __init__(self,
+                 cache_dir         : Optional[Path] = None,
+                 max_concurrency   : int = 8,
+                 page_workers      : int = 1,
+                 prefetch_pages    : int = 0,
+                 cache             : Optional[DataTrackerCache] = None,
+                 memory_cache_size : int = 10000,
+                 query_ttl         : Optional[timedelta] = None,
+                 cache_ttl         : Optional[Dict[Type[URI], Optional[timedelta]]] = None,
+                 lazy              : bool = False,
+                 pool_size         : Optional[int] = None,
+                 rate_limit        : Optional[float] = None,
+                 rate_burst        : int = 10,
+                 conn_max_requests : int = 99,
+                 conn_max_age      : Optional[timedelta] = None,
+                 max_retries       : int = 5,
+                 keyset_paging     : bool = False,
+                 transport         : Optional[Transport] = None,
+                 base_url          : str = "https://datatracker.ietf.org"):
+        """
+        Parameters:
+            cache_dir         -- If set, use this directory as a cache for Datatracker objects
+            max_concurrency   -- The maximum number of requests in progress at once
+            page_workers      -- The number of pages of results from each list query that
+                                 can be fetched in parallel (see DataTracker)
+            prefetch_pages    -- The number of pages of results from each list query to
+                                 fetch ahead of the caller (see DataTracker)
+            cache             -- If set, use this to cache Datatracker objects, rather
+                                 than a FileCache in cache_dir (see DataTracker)
+            memory_cache_size -- The number of parsed objects to hold in memory (see
+                                 DataTracker)
+            query_ttl         -- If set, the time for which the results of list queries
+                                 are cached (see DataTracker)
+            cache_ttl         -- The time for which cached objects are fresh, by URI type
+                                 (see DataTracker)
+            lazy              -- If True, decode the fields of each object when first
+                                 accessed (see DataTracker)
+            pool_size         -- The number of persistent connections to the datatracker
+                                 (see DataTracker). Defaults to max_concurrency, so each
+                                 request in progress has its own connection.
+            rate_limit        -- If set, the maximum average number of requests per second
+                                 (see DataTracker)
+            rate_burst        -- The number of requests that can be made in a burst (see
+                                 DataTracker)
+            conn_max_requests -- The number of requests to make on a connection before it
+                                 is reopened (see DataTracker)
+            conn_max_age      -- If set, the age at which connections are reopened (see
+                                 DataTracker)
+            max_retries       -- The number of times to retry a failed request (see
+                                 DataTracker)
+            keyset_paging     -- If True, page list queries by id rather than by offset
+                                 (see DataTracker)
+            transport         -- If set, make requests using this transport (see
+                                 DataTracker)
+            base_url          -- The URL of the datatracker (see DataTracker)
+        """
+        self.dt = DataTracker(cache_dir=cache_dir, page_workers=page_workers, prefetch_pages=prefetch_pages,
+                              cache=cache, memory_cache_size=memory_cache_size, query_ttl=query_ttl,
+                              cache_ttl=cache_ttl, lazy=lazy,
+                              pool_size=max_concurrency if pool_size is None else pool_size,
+                              rate_limit=rate_limit, rate_burst=rate_burst,
+                              conn_max_requests=conn_max_requests, conn_max_age=conn_max_age,
+                              max_retries=max_retries, keyset_paging=keyset_paging,
+                              transport=transport, base_url=base_url)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        # The number of objects fetched from an iterator in each call to
+        # a worker thread. This matches the page size used by DataTracker,
+        # so each call fetches and parses one page of results.
+        self._batch_size = 100
+
+
+    async def __aenter__(self) -> "AsyncDataTracker":
+        return self
+
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        """
+        Waits for any requests in progress to complete, then closes the
+        connections to the datatracker.
+        """
+        self._executor.shutdown(wait=True)
+        self.dt.close()
+
+
+    async def _run(self, func: Callable[..., R], *args: Any) -> R:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+
+    async def _iterate(self, objs: Iterator[R]) -> AsyncIterator[R]:
+        while True:
+            batch = await self._run(_take, objs, self._batch_size)
+            for obj in batch:
+                yield obj
+            if len(batch) < self._batch_size:
+                return
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Raw mode:
+
+    def raw(self, field_names: List[str], cache: bool = False, as_dict: bool = False) -> "AsyncDataTracker":
+        """
+        Returns a view of this AsyncDataTracker in raw mode (see DataTracker.raw()).
+        The view shares its worker threads with this AsyncDataTracker, so
+        should not be closed separately.
+        """
+        view = copy.copy(self)
+        view.dt = self.dt.raw(field_names, cache, as_dict)
+        return view
+
+
+    def checkpoint(self, checkpoint_file: Path) -> "AsyncDataTracker":
+        """
+        Returns a view of this AsyncDataTracker that records the progress of
+        list queries in checkpoint_file (see DataTracker.checkpoint()). The
+        view shares its worker threads with this AsyncDataTracker, so should
+        not be closed separately.
+        """
+        view = copy.copy(self)
+        view.dt = self.dt.checkpoint(checkpoint_file)
+        return view
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Retrieving several objects at once:
+
+    async def resolve_many(self, resource_uris: Sequence[URI], obj_type: Type[T]) -> List[Optional[T]]:
+        return await self._run(self.dt.resolve_many, resource_uris, obj_type)
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Incremental synchronisation:
+
+    async def sync(self, resource_types: List[Type[Resource]], state_file: Path) -> SyncSummary:
+        return await self._run(self.dt.sync, resource_types, state_file)
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about people:
+
+    async def person(self, person_uri: PersonURI) -> Optional[Person]:
+        return await self._run(self.dt.person, person_uri)
+
+
+    async def person_from_email(self, email_addr: str) -> Optional[Person]:
+        return await self._run(self.dt.person_from_email, email_addr)
+
+
+    def person_aliases(self, person: Person) -> AsyncIterator[PersonAlias]:
+        return self._iterate(self.dt.person_aliases(person))
+
+
+    def person_history(self, person: Person) -> AsyncIterator[HistoricalPerson]:
+        return self._iterate(self.dt.person_history(person))
+
+
+    def person_events(self, person: Person) -> AsyncIterator[PersonEvent]:
+        return self._iterate(self.dt.person_events(person))
+
+
+    def people(self,
+            since : str ="1970-01-01T00:00:00",
+            until : str ="2038-01-19T03:14:07",
+            name_contains : Optional[str] = None) -> AsyncIterator[Person]:
+        return self._iterate(self.dt.people(since, until, name_contains))
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about email addresses:
+
+    async def email(self, email_uri: EmailURI) -> Optional[Email]:
+        return await self._run(self.dt.email, email_uri)
+
+
+    def email_for_person(self, person: Person) -> AsyncIterator[Email]:
+        return self._iterate(self.dt.email_for_person(person))
+
+
+    def email_history_for_address(self, email_addr: str) -> AsyncIterator[HistoricalEmail]:
+        return self._iterate(self.dt.email_history_for_address(email_addr))
+
+
+    def email_history_for_person(self, person: Person) -> AsyncIterator[HistoricalEmail]:
+        return self._iterate(self.dt.email_history_for_person(person))
+
+
+    def emails(self,
+               since : str ="1970-01-01T00:00:00",
+               until : str ="2038-01-19T03:14:07",
+               addr_contains : Optional[str] = None) -> AsyncIterator[Email]:
+        return self._iterate(self.dt.emails(since, until, addr_contains))
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about documents:
+
+    async def document(self, document_uri: DocumentURI) -> Optional[Document]:
+        return await self._run(self.dt.document, document_uri)
+
+
+    def documents(self,
+            since   : str = "1970-01-01T00:00:00",
+            until   : str = "2038-01-19T03:14:07",
+            doctype : Optional[DocumentType] = None,
+            group   : Optional[Group]        = None,
+            expand  : Optional[List[str]]    = None) -> AsyncIterator[Document]:
+        return self._iterate(self.dt.documents(since, until, doctype, group, expand))
+
+
+    def docaliases_from_name(self, alias: str) -> AsyncIterator[DocumentAlias]:
+        return self._iterate(self.dt.docaliases_from_name(alias))
+
+
+    async def document_from_draft(self, draft: str) -> Optional[Document]:
+        return await self._run(self.dt.document_from_draft, draft)
+
+
+    async def document_from_rfc(self, rfc: str) -> Optional[Document]:
+        return await self._run(self.dt.document_from_rfc, rfc)
+
+
+    def documents_from_bcp(self, bcp: str) -> AsyncIterator[Document]:
+        return self._iterate(self.dt.documents_from_bcp(bcp))
+
+
+    def documents_from_std(self, std: str) -> AsyncIterator[Document]:
+        return self._iterate(self.dt.documents_from_std(std))
+
+
+    async def document_type(self, doctype: str) -> Optional[DocumentType]:
+        return await self._run(self.dt.document_type, doctype)
+
+
+    def document_types(self) -> AsyncIterator[DocumentType]:
+        return self._iterate(self.dt.document_types())
+
+
+    async def document_state(self, state_uri: DocumentStateURI) -> Optional[DocumentState]:
+        return await self._run(self.dt.document_state, state_uri)
+
+
+    def document_states(self, state_type : Optional[DocumentStateType] = None) -> AsyncIterator[DocumentState]:
+        return self._iterate(self.dt.document_states(state_type))
+
+
+    async def document_state_type(self, state_type_uri : DocumentStateTypeURI) -> Optional[DocumentStateType]:
+        return await self._run(self.dt.document_state_type, state_type_uri)
+
+
+    def document_state_types(self) -> AsyncIterator[DocumentStateType]:
+        return self._iterate(self.dt.document_state_types())
+
+
+    async def document_event(self, event_uri : DocumentEventURI) -> Optional[DocumentEvent]:
+        return await self._run(self.dt.document_event, event_uri)
+
+
+    def document_events(self,
+                        since      : str = "1970-01-01T00:00:00",
+                        until      : str = "2038-01-19T03:14:07",
+                        doc        : Optional[Document] = None,
+                        by         : Optional[Person]   = None,
+                        event_type : Optional[str]      = None,
+                        expand     : Optional[List[str]] = None) -> AsyncIterator[DocumentEvent]:
+        return self._iterate(self.dt.document_events(since, until, doc, by, event_type, expand))
+
+
+    def document_authors(self, document : Document, expand : Optional[List[str]] = None) -> AsyncIterator[DocumentAuthor]:
+        return self._iterate(self.dt.document_authors(document, expand))
+
+
+    def documents_authored_by_person(self, person : Person, expand : Optional[List[str]] = None) -> AsyncIterator[DocumentAuthor]:
+        return self._iterate(self.dt.documents_authored_by_person(person, expand))
+
+
+    def documents_authored_by_email(self, email : Email, expand : Optional[List[str]] = None) -> AsyncIterator[DocumentAuthor]:
+        return self._iterate(self.dt.documents_authored_by_email(email, expand))
+
+
+    def related_documents(self,
+        source               : Optional[Document]         = None,
+        target               : Optional[DocumentAlias]    = None,
+        relationship_type    : Optional[RelationshipType] = None) -> AsyncIterator[RelatedDocument]:
+        return self._iterate(self.dt.related_documents(source, target, relationship_type))
+
+
+    async def relationship_type(self, relationship_type_uri: RelationshipTypeURI) -> Optional[RelationshipType]:
+        return await self._run(self.dt.relationship_type, relationship_type_uri)
+
+
+    def relationship_types(self) -> AsyncIterator[RelationshipType]:
+        return self._iterate(self.dt.relationship_types())
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about ballots and document approval:
+
+    async def ballot_position_name(self, ballot_position_name_uri : BallotPositionNameURI) -> Optional[BallotPositionName]:
+        return await self._run(self.dt.ballot_position_name, ballot_position_name_uri)
+
+
+    def ballot_position_names(self) -> AsyncIterator[BallotPositionName]:
+        return self._iterate(self.dt.ballot_position_names())
+
+
+    async def ballot_type(self, ballot_type_uri : BallotTypeURI) -> Optional[BallotType]:
+        return await self._run(self.dt.ballot_type, ballot_type_uri)
+
+
+    def ballot_types(self, doc_type : Optional[DocumentType]) -> AsyncIterator[BallotType]:
+        return self._iterate(self.dt.ballot_types(doc_type))
+
+
+    async def ballot_document_event(self, ballot_event_uri : BallotDocumentEventURI) -> Optional[BallotDocumentEvent]:
+        return await self._run(self.dt.ballot_document_event, ballot_event_uri)
+
+
+    def ballot_document_events(self,
+                        since       : str = "1970-01-01T00:00:00",
+                        until       : str = "2038-01-19T03:14:07",
+                        ballot_type : Optional[BallotType]    = None,
+                        event_type  : Optional[str]           = None,
+                        by          : Optional[Person]        = None,
+                        doc         : Optional[Document]      = None,
+                        expand      : Optional[List[str]]     = None) -> AsyncIterator[BallotDocumentEvent]:
+        return self._iterate(self.dt.ballot_document_events(since, until, ballot_type, event_type, by, doc, expand))
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about document submissions:
+
+    async def submission(self, submission_uri: SubmissionURI) -> Optional[Submission]:
+        return await self._run(self.dt.submission, submission_uri)
+
+
+    def submissions(self,
+            since           : str = "1970-01-01T00:00:00",
+            until           : str = "2038-01-19T03:14:07") -> AsyncIterator[Submission]:
+        return self._iterate(self.dt.submissions(since, until))
+
+
+    async def submission_event(self, event_uri: SubmissionEventURI) -> Optional[SubmissionEvent]:
+        return await self._run(self.dt.submission_event, event_uri)
+
+
+    def submission_events(self,
+                        since      : str = "1970-01-01T00:00:00",
+                        until      : str = "2038-01-19T03:14:07",
+                        by         : Optional[Person]     = None,
+                        submission : Optional[Submission] = None) -> AsyncIterator[SubmissionEvent]:
+        return self._iterate(self.dt.submission_events(since, until, by, submission))
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about RFC publication streams:
+
+    async def stream(self, stream_uri: StreamURI) -> Optional[Stream]:
+        return await self._run(self.dt.stream, stream_uri)
+
+
+    def streams(self) -> AsyncIterator[Stream]:
+        return self._iterate(self.dt.streams())
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about working groups:
+
+    async def group(self, group_uri: GroupURI) -> Optional[Group]:
+        return await self._run(self.dt.group, group_uri)
+
+
+    async def group_from_acronym(self, acronym: str) -> Optional[Group]:
+        return await self._run(self.dt.group_from_acronym, acronym)
+
+
+    def groups(self,
+            since         : str                  = "1970-01-01T00:00:00",
+            until         : str                  = "2038-01-19T03:14:07",
+            name_contains : Optional[str]        = None,
+            state         : Optional[GroupState] = None,
+            parent        : Optional[Group]      = None) -> AsyncIterator[Group]:
+        return self._iterate(self.dt.groups(since, until, name_contains, state, parent))
+
+
+    async def group_state(self, group_state : str) -> Optional[GroupState]:
+        return await self._run(self.dt.group_state, group_state)
+
+
+    def group_states(self) -> AsyncIterator[GroupState]:
+        return self._iterate(self.dt.group_states())
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about meetings:
+
+    async def meeting_session_assignment(self, assignment_uri : SessionAssignmentURI) -> Optional[SessionAssignment]:
+        return await self._run(self.dt.meeting_session_assignment, assignment_uri)
+
+
+    def meeting_session_assignments(self, schedule : Schedule) -> AsyncIterator[SessionAssignment]:
+        return self._iterate(self.dt.meeting_session_assignments(schedule))
+
+
+    async def meeting_schedule(self, schedule_uri : ScheduleURI) -> Optional[Schedule]:
+        return await self._run(self.dt.meeting_schedule, schedule_uri)
+
+
+    async def meeting(self, meeting_uri : MeetingURI) -> Optional[Meeting]:
+        return await self._run(self.dt.meeting, meeting_uri)
+
+
+    def meetings(self,
+            start_date   : str = "1970-01-01",
+            end_date     : str = "2038-01-19",
+            meeting_type : Optional[MeetingType] = None) -> AsyncIterator[Meeting]:
+        return self._iterate(self.dt.meetings(start_date, end_date, meeting_type))
+
+
+    async def meeting_type(self, meeting_type: str) -> Optional[MeetingType]:
+        return await self._run(self.dt.meeting_type, meeting_type)
+
+
+    def meeting_types(self) -> AsyncIterator[MeetingType]:
+        return self._iterate(self.dt.meeting_types())
+
+
+    # ----------------------------------------------------------------------------------------------------------------------------
+    # Methods returning information about mailing lists:
+
+    async def mailing_list(self, mailing_list_uri: MailingListURI) -> Optional[MailingList]:
+        return await self._run(self.dt.mailing_list, mailing_list_uri)
+
+
+    def mailing_lists(self) -> AsyncIterator[MailingList]:
+        return self._iterate(self.dt.mailing_lists())
+
+
+    def mailing_list_subscriptions(self, email_addr : Optional[str]) -> AsyncIterator[MailingListSubscriptions]:
+        return self._iterate(self.dt.mailing_list_subscriptions(email_addr))
+
+
+# =================================================================================================================================
+# Helper functions:
+
+def _take(objs: Iterator[R], count: int) -> List[R]:
+    # Run in a worker thread, to fetch the next `count` objects from an
+    # iterator. The iterator is only ever advanced by one thread at once.
+    return list(islice(objs, count))
+
+
+# =================================================================================================================================
+# vim: set tw=0 ai:
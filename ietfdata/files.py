@@ -0,0 +1,64 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# The module contains helpers for the files written by DataTracker and
+# RFCIndex, such as their caches, checkpoints, and state files, that can be
+# read by other threads or processes while they are being updated.
+
+from contextlib import contextmanager
+from pathlib    import Path
+from typing     import Any, IO, Iterator
+
+import os
+import tempfile
+
+# =================================================================================================================================
+
+@contextmanager
+def replace_file(path: Path, mode: str = "wb") -> Iterator[IO[Any]]:
+    """
+    Opens a temporary file, in the same directory as path, that is renamed to
+    path once it has been written. Concurrent readers of path see either the
+    old or the new contents, and never a partially written file. If writing
+    fails, the temporary file is removed and path is unchanged. For example:
+
+        with replace_file(Path("state.json"), "w") as outf:
+            json.dump(state, outf)
+
+    Parameters:
+        path -- The file to replace
+        mode -- The mode in which to open the temporary file ("wb" or "w")
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as outf:
+            yield outf
+        os.replace(tmp_name, str(path))
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+# =================================================================================================================================
+# vim: set tw=0 ai:
@@ -23,17 +23,27 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
-from typing   import NewType, Iterator, List, Optional, Tuple, Dict
+from typing   import BinaryIO, IO, NewType, Iterator, List, Optional, Set, Tuple, Dict, cast
 from datetime import datetime
+from pathlib  import Path
 
 import xml.etree.ElementTree as ET
-import requests
+import bisect
+import gc
+import json
+import pickle
 import unittest
 
+from ietfdata.files     import replace_file
+from ietfdata.transport import Transport, HTTPTransport
+
 # ==================================================================================================
 
 DocID = NewType('DocID', str)
 
+_MONTHS = {"January" : 1, "February" : 2, "March"     : 3, "April"   :  4, "May"      :  5, "June"     :  6,
+           "July"    : 7, "August"   : 8, "September" : 9, "October" : 10, "November" : 11, "December" : 12}
+
 class RfcEntry:
     """
     An RFC entry in the rfc-index.xml file. No attempt is made to
@@ -287,12 +297,11 @@ class RfcEntry:
 
 
     def date(self) -> datetime:
-        if self.day != None:
-            date = "{} {} {}".format(self.day, self.month, self.year)
-            return datetime.strptime(date, "%d %B %Y")
-        else:
-            date = "{} {}".format(self.month, self.year)
-            return datetime.strptime(date, "%B %Y")
+        # The day is only recorded for 1 April RFCs; otherwise, use the first
+        # day of the month, as strptime() would given only the month and year.
+        if self.month not in _MONTHS:
+            raise ValueError("unknown month: {}".format(self.month))
+        return datetime(self.year, _MONTHS[self.month], self.day if self.day is not None else 1)
 
 
 
@@ -430,6 +439,28 @@ class FyiEntry:
 
 # ==================================================================================================
 
+class _TeeReader:
+    """
+    A file-like object that reads from source, writing a copy of everything
+    read to another file.
+    """
+    def __init__(self, source: BinaryIO, copy: IO[bytes]) -> None:
+        self.source = source
+        self.copy   = copy
+
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        self.copy.write(data)
+        return data
+
+
+# The version of the format of the snapshots of the parsed RFC index stored in
+# the cache directory. Snapshots with a different version are ignored, and the
+# cached rfc-index.xml is parsed instead.
+SNAPSHOT_VERSION = 1
+
+
 class RFCIndex:
     """
     The RFC Index.
@@ -440,22 +471,100 @@ class RFCIndex:
     _std            : Dict[str, StdEntry]
     _fyi            : Dict[str, FyiEntry]
 
+    # Indexes used by rfcs(). Each RFC is identified by its position in _rfc_list,
+    # which holds the RFCs in the order they appear in the RFC index.
+    _rfc_list       : List[RfcEntry]
+    _rfc_dates      : List[datetime]                           # The date of each RFC, by position
+    _date_keys      : List[datetime]                           # The dates of the RFCs, in sorted order...
+    _date_posns     : List[int]                                # ...and the positions of the RFCs with those dates
+    _postings       : Dict[str, Dict[Optional[str], Set[int]]] # Attribute -> value -> positions of RFCs with that value
+
 
-    def __init__(self) -> None:
+    def __init__(self,
+                 transport      : Optional[Transport] = None,
+                 url            : str = "https://www.rfc-editor.org/rfc-index.xml",
+                 rfc_index_file : Optional[Path] = None,
+                 cache_dir      : Optional[Path] = None) -> None:
+        """
+        Parameters:
+            transport      -- If set, fetch the RFC index using this transport, rather
+                              than an HTTPTransport (e.g., a ReplayTransport)
+            url            -- The URL of the RFC index
+            rfc_index_file -- If set, read the RFC index from this file, rather than
+                              fetching it from url
+            cache_dir      -- If set, use this directory as a cache for the RFC index
+
+        The RFC index is parsed as it is read, one entry at a time, so the
+        whole of the file is never held in memory.
+
+        If cache_dir is set, the RFC index is stored there, along with its ETag
+        and Last-Modified time, and a snapshot of the parsed entries. Later
+        instances make a conditional request for the RFC index, and if it has
+        not changed, load the snapshot rather than parsing the RFC index again.
+        The snapshot is a pickle, so the cache directory must not be writable
+        by anyone you do not trust.
+        """
         self._rfc            = {}
         self._rfc_not_issued = {}
         self._bcp            = {}
         self._std            = {}
         self._fyi            = {}
 
-        session  = requests.Session()
-        response = session.get("https://www.rfc-editor.org/rfc-index.xml", verify=True)
-        if response.status_code != 200:
-            print("cannot fetch RFC index")
+        if rfc_index_file is not None:
+            with open(rfc_index_file, "rb") as inf:
+                self._parse(inf)
+            self._build_indexes()
             return
-        session.close()
 
-        for doc in ET.fromstring(response.text):
+        http = None # type: Optional[HTTPTransport]
+        if transport is None:
+            transport = http = HTTPTransport()
+        try:
+            validators = self._cached_validators(cache_dir, url) if cache_dir is not None else None
+            headers    = {} # type: Dict[str, str]
+            if validators is not None:
+                etag          = validators.get("etag")
+                last_modified = validators.get("last_modified")
+                if etag is not None:
+                    headers["If-None-Match"] = etag
+                if last_modified is not None:
+                    headers["If-Modified-Since"] = last_modified
+            with transport.stream(url, {}, headers) as response:
+                if response.status_code == 304 and cache_dir is not None and validators is not None:
+                    self._load_cached(cache_dir, validators)
+                elif response.status_code != 200:
+                    print("cannot fetch RFC index")
+                elif cache_dir is None:
+                    self._parse(response.raw)
+                else:
+                    validators = {
+                        "url"           : url,
+                        "etag"          : response.headers.get("ETag"),
+                        "last_modified" : response.headers.get("Last-Modified")
+                    }
+                    self._parse_and_cache(response.raw, cache_dir, validators)
+        finally:
+            if http is not None:
+                http.close()
+        self._build_indexes()
+
+
+    def _parse(self, source: IO[bytes]) -> None:
+        # Parse the RFC index incrementally. Each top-level entry is processed
+        # once its end tag has been read, then removed from the root element,
+        # so the tree never holds more than one entry. The entry objects keep
+        # only the parts of the tree they need, such as the abstract.
+        depth = 0
+        root  = None # type: Optional[ET.Element]
+        for event, doc in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = doc
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
             if   doc.tag == "{http://www.rfc-editor.org/rfc-index}rfc-entry":
                 rfc = RfcEntry(doc)
                 self._rfc[rfc.doc_id] = rfc
@@ -473,6 +582,75 @@ class RFCIndex:
                 self._fyi[fyi.doc_id] = fyi
             else:
                 raise NotImplementedError
+            assert root is not None
+            root.clear()
+
+
+    # ----------------------------------------------------------------------------------------------
+    # Caching the RFC index:
+    #
+    # The cache directory holds the RFC index as fetched (rfc-index.xml), the URL
+    # it was fetched from and its ETag and Last-Modified time (rfc-index.json),
+    # and a snapshot of the parsed entries (rfc-index.pickle). The snapshot
+    # records the validators of the RFC index it was made from, so a snapshot
+    # that is out of date is never used. Each file is written to a temporary
+    # file and then renamed (see replace_file()), so readers never see a
+    # partially written file.
+
+    def _cached_validators(self, cache_dir: Path, url: str) -> Optional[Dict[str, Optional[str]]]:
+        # The validators of the cached RFC index, if it was fetched from url
+        try:
+            with open(Path(cache_dir, "rfc-index.json")) as inf:
+                validators = json.load(inf) # type: Dict[str, Optional[str]]
+        except (OSError, ValueError):
+            return None
+        if validators.get("url") != url or not Path(cache_dir, "rfc-index.xml").exists():
+            return None
+        if validators.get("etag") is None and validators.get("last_modified") is None:
+            return None
+        return validators
+
+
+    def _parse_and_cache(self, source: BinaryIO, cache_dir: Path, validators: Dict[str, Optional[str]]) -> None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with replace_file(Path(cache_dir, "rfc-index.xml")) as outf:
+            self._parse(cast(IO[bytes], _TeeReader(source, outf)))
+        self._write_snapshot(cache_dir, validators)
+        with replace_file(Path(cache_dir, "rfc-index.json"), "w") as outf:
+            json.dump(validators, outf)
+
+
+    def _load_cached(self, cache_dir: Path, validators: Dict[str, Optional[str]]) -> None:
+        try:
+            # The snapshot holds many small objects, none of which can be part
+            # of a reference cycle, so disable the garbage collector while it
+            # is loaded. Otherwise, it would run many times, and take as long
+            # as unpickling the snapshot.
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                with open(Path(cache_dir, "rfc-index.pickle"), "rb") as inf:
+                    snapshot = pickle.load(inf)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            if isinstance(snapshot, tuple) and len(snapshot) == 3 and snapshot[0] == SNAPSHOT_VERSION and snapshot[1] == validators:
+                self._rfc, self._rfc_not_issued, self._bcp, self._std, self._fyi = snapshot[2]
+                return
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # The snapshot is missing, truncated, or refers to classes that do
+            # not exist, because it was written by an incompatible version of
+            # this module; parse the cached RFC index instead.
+            pass
+        with open(Path(cache_dir, "rfc-index.xml"), "rb") as inf:
+            self._parse(inf)
+        self._write_snapshot(cache_dir, validators)
+
+
+    def _write_snapshot(self, cache_dir: Path, validators: Dict[str, Optional[str]]) -> None:
+        entries = (self._rfc, self._rfc_not_issued, self._bcp, self._std, self._fyi)
+        with replace_file(Path(cache_dir, "rfc-index.pickle")) as outf:
+            pickle.dump((SNAPSHOT_VERSION, validators, entries), outf, protocol=pickle.HIGHEST_PROTOCOL)
 
 
     def rfc(self, rfc_id: str) -> Optional[RfcEntry]:
@@ -502,21 +680,50 @@ class RFCIndex:
             area:   Optional[str] = None,
             wg:     Optional[str] = None,
             status: Optional[str] = None) -> Iterator[RfcEntry]:
-        for rfc_id in self._rfc:
-            rfc = self._rfc[rfc_id]
-            if stream is not None and rfc.stream != stream:
-                continue
-            if area   is not None and rfc.area   != area:
-                continue
-            if wg     is not None and rfc.wg     != wg:
-                continue
-            if status is not None and rfc.curr_status != status:
-                continue
-            if rfc.date() < datetime.strptime(since, "%Y-%m"):
-                continue
-            if rfc.date() > datetime.strptime(until, "%Y-%m"):
+        """
+        Returns the RFCs published between the start of the month since and the
+        start of the month until, inclusive, that match the other parameters
+        that are not None. The RFCs are returned in the order they appear in
+        the RFC index.
+        """
+        since_date = datetime.strptime(since, "%Y-%m")
+        until_date = datetime.strptime(until, "%Y-%m")
+
+        # Find the smallest set of candidates: either the RFCs with the least
+        # common of the requested attribute values, or the RFCs in the range of
+        # dates. Then check the candidates against the other parameters.
+        postings = []
+        for attr, value in [("stream", stream), ("area", area), ("wg", wg), ("curr_status", status)]:
+            if value is not None:
+                postings.append(self._postings[attr].get(value, set()))
+        lo = bisect.bisect_left(self._date_keys,  since_date)
+        hi = bisect.bisect_right(self._date_keys, until_date)
+
+        if len(postings) == 0 or hi - lo < min(len(p) for p in postings):
+            candidates = sorted(self._date_posns[lo:hi])
+            check_date = False
+        else:
+            postings.sort(key=len)
+            candidates = sorted(postings.pop(0))
+            check_date = True
+
+        for posn in candidates:
+            if check_date and not since_date <= self._rfc_dates[posn] <= until_date:
                 continue
-            yield(rfc)
+            if all(posn in p for p in postings):
+                yield self._rfc_list[posn]
+
+
+    def _build_indexes(self) -> None:
+        self._rfc_list  = list(self._rfc.values())
+        self._rfc_dates = [rfc.date() for rfc in self._rfc_list]
+        by_date = sorted(range(len(self._rfc_list)), key=lambda posn: self._rfc_dates[posn])
+        self._date_keys  = [self._rfc_dates[posn] for posn in by_date]
+        self._date_posns = by_date
+        self._postings   = {"stream": {}, "area": {}, "wg": {}, "curr_status": {}}
+        for posn, rfc in enumerate(self._rfc_list):
+            for attr, index in self._postings.items():
+                index.setdefault(getattr(rfc, attr), set()).add(posn)
 
 
 # ==================================================================================================
@@ -0,0 +1,327 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# The module contains a small HTTP server that stands in for the datatracker,
+# serving the objects recorded in an archive (see transport.py) with the
+# same URLs, and the same paging and filtering semantics, as the Tastypie
+# API of the datatracker. This allows DataTracker to be tested, and its
+# performance measured, reproducibly and without network access.
+#
+# To serve an archive:
+#   python3 -m ietfdata.tastypie_server archive.jsonl.gz --port 8000
+#
+# and then use DataTracker(base_url="http://127.0.0.1:8000").
+
+from http.server  import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib      import Path
+from typing       import Any, Dict, List, Optional, Tuple, cast
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import argparse
+import json
+import threading
+
+from ietfdata.transport import Response, read_archive
+
+# =================================================================================================================================
+# Filtering and paging lists of objects, as done by Tastypie:
+
+# The query parameters that control paging and the format of the results,
+# rather than filtering the objects.
+PAGING_PARAMS = ["format", "limit", "offset", "order_by"]
+
+# The default, and maximum, number of objects in each page of results.
+DEFAULT_LIMIT = 20
+MAX_LIMIT     = 1000
+
+
+def _endpoint(resource_uri: str) -> str:
+    # The list endpoint of an object (e.g., "/api/v1/person/person/" for
+    # "/api/v1/person/person/20209/").
+    return resource_uri[:resource_uri.rstrip("/").rfind("/") + 1]
+
+
+def _compare_value(obj_value: Any, value: str) -> Any:
+    # Convert value, a query parameter, to a value that can be compared with
+    # obj_value. References to other objects can be given as a URI or as the
+    # last component of the URI, as accepted by the datatracker.
+    if isinstance(obj_value, bool):
+        return value.lower() in ["true", "1"]
+    elif isinstance(obj_value, int):
+        return int(value)
+    elif isinstance(obj_value, float):
+        return float(value)
+    else:
+        return value
+
+
+def _field_value(obj_value: Any, value: str) -> Any:
+    if isinstance(obj_value, str) and obj_value.startswith("/api/v1/") and not value.startswith("/"):
+        return obj_value.rstrip("/").rsplit("/", 1)[-1]
+    return obj_value
+
+
+def _matches(obj: Dict[str, Any], name: str, value: str) -> bool:
+    # Returns True if obj matches the filter name=value (e.g., "id__in=1,2").
+    # Filtering on a field that the objects do not have is an error, as in
+    # Tastypie, rather than matching nothing.
+    field_name, _, lookup = name.partition("__")
+    if field_name not in obj:
+        raise ValueError("Unknown field '{}'".format(field_name))
+    obj_value = obj[field_name]
+    if lookup == "in":
+        return any(_matches(obj, field_name, v) for v in value.split(","))
+    if lookup == "isnull":
+        return (obj_value is None) == (value.lower() in ["true", "1"])
+    if obj_value is None:
+        return False
+    if isinstance(obj_value, list):
+        return any(_matches(dict(obj, **{field_name: v}), name, value) for v in obj_value)
+    try:
+        actual   = _field_value(obj_value, value)
+        expected = _compare_value(actual, value)
+    except ValueError:
+        return False
+    if lookup == "":
+        return bool(actual == expected)
+    elif lookup == "gt":
+        return bool(actual >  expected)
+    elif lookup == "gte":
+        return bool(actual >= expected)
+    elif lookup == "lt":
+        return bool(actual <  expected)
+    elif lookup == "lte":
+        return bool(actual <= expected)
+    elif lookup == "contains":
+        return str(expected) in str(actual)
+    elif lookup == "icontains":
+        return str(expected).lower() in str(actual).lower()
+    elif lookup == "startswith":
+        return str(actual).startswith(str(expected))
+    else:
+        raise ValueError("Unsupported filter '{}'".format(name))
+
+
+def list_page(endpoint: str, objs: List[Dict[str, Any]], params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Returns the page of objs, the objects of an endpoint, selected by params,
+    as Tastypie would. The objects are filtered, and ordered by the order_by
+    parameter, if any. The page holds at most limit objects, starting at the
+    specified offset. The "meta" of the page gives the total number of objects
+    that matched, and the URLs of the next and previous pages, if any.
+
+    Raises:
+        ValueError, if the parameters are invalid
+    """
+    limit  = int(params.get("limit", DEFAULT_LIMIT))
+    limit  = MAX_LIMIT if limit == 0 else min(limit, MAX_LIMIT)
+    offset = int(params.get("offset", 0))
+    for name, value in params.items():
+        if name not in PAGING_PARAMS:
+            objs = [obj for obj in objs if _matches(obj, name, value)]
+    order_by = params.get("order_by")
+    if order_by is not None:
+        key  = order_by.lstrip("-")
+        objs = sorted(objs, key=lambda obj: (obj.get(key) is None, obj.get(key)), reverse=order_by.startswith("-"))
+
+    def link(link_offset: int) -> str:
+        link_params = [(k, v) for k, v in params.items() if k not in ["limit", "offset"]]
+        return endpoint + "?" + urlencode(link_params + [("limit", str(limit)), ("offset", str(link_offset))])
+
+    return {
+        "meta" : {
+            "limit"       : limit,
+            "next"        : link(offset + limit) if offset + limit < len(objs) else None,
+            "offset"      : offset,
+            "previous"    : link(max(0, offset - limit)) if offset > 0 else None,
+            "total_count" : len(objs)
+        },
+        "objects" : objs[offset:offset + limit]
+    }
+
+
+# =================================================================================================================================
+# The server:
+
+class TastypieServer:
+    """
+    An HTTP server that stands in for the datatracker, serving the objects
+    recorded in an archive. Every object in the recorded responses, whether
+    retrieved individually or as part of a list, can be retrieved using its
+    resource URI, and the objects of each endpoint can be listed with the
+    paging (limit and offset), filtering, and ordering of the Tastypie API.
+    Other recorded responses (e.g., for the RFC index) are served as they
+    were recorded. Anything else gives a 404 (Not Found) response.
+
+    The server runs in a background thread, once started. For example:
+
+        with TastypieServer(Path("archive.jsonl.gz")) as server:
+            dt = DataTracker(base_url=server.base_url)
+            ...
+    """
+    def __init__(self, archive: Path, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        Parameters:
+            archive -- The archive of recorded responses to serve
+            host    -- The address on which to listen
+            port    -- The port on which to listen, or 0 to choose a free port
+        """
+        self.objects   = {} # type: Dict[str, Dict[str, Any]]
+        self.endpoints = {} # type: Dict[str, List[Dict[str, Any]]]
+        self.responses = {} # type: Dict[str, Response]
+        self._indexes  = {} # type: Dict[str, int]
+        for key, response in read_archive(archive):
+            parts = urlsplit(key)
+            self.responses[parts.path + ("?" + parts.query if parts.query else "")] = response
+            if response.status_code != 200:
+                continue
+            try:
+                body = json.loads(response.content)
+            except ValueError:
+                continue
+            if isinstance(body, dict) and "objects" in body and "meta" in body:
+                for obj in body["objects"]:
+                    self._add(obj)
+            elif isinstance(body, dict) and "resource_uri" in body:
+                self._add(body)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None # type: Optional[threading.Thread]
+
+
+    def _add(self, obj: Dict[str, Any]) -> None:
+        # Add obj to its endpoint or, if it was already added, replace it while
+        # keeping its position. The position of each object in its endpoint is
+        # recorded, so archives with many objects load in linear time.
+        uri  = obj["resource_uri"]
+        objs = self.endpoints.setdefault(_endpoint(uri), [])
+        if uri not in self._indexes:
+            self._indexes[uri] = len(objs)
+            objs.append(obj)
+        else:
+            objs[self._indexes[uri]] = obj
+        self.objects[uri] = obj
+
+
+    @property
+    def base_url(self) -> str:
+        """
+        The URL of the server, to be used as the base_url of a DataTracker.
+        """
+        host = cast(str, self._server.server_address[0])
+        port = self._server.server_address[1]
+        return "http://{}:{}".format(host, port)
+
+
+    def respond(self, path: str, query: str) -> Tuple[int, str, bytes]:
+        """
+        Returns the status code, content type, and body of the response to a
+        GET request for path, with the specified query string.
+        """
+        params = dict(parse_qsl(query, keep_blank_values=True))
+        if path in self.objects:
+            return 200, "application/json", json.dumps(self.objects[path]).encode("utf-8")
+        if path in self.endpoints:
+            try:
+                page = list_page(path, self.endpoints[path], params)
+            except ValueError as e:
+                return 400, "text/plain", str(e).encode("utf-8")
+            return 200, "application/json", json.dumps(page).encode("utf-8")
+        key = path + ("?" + urlencode(sorted(params.items())) if len(params) > 0 else "")
+        response = self.responses.get(key)
+        if response is not None:
+            return response.status_code, response.headers.get("Content-Type", "application/octet-stream"), response.content
+        return 404, "text/plain", b"Not found"
+
+
+    def _handler(self) -> Any:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # The headers and body of each response are written separately, so
+            # Nagle's algorithm would delay the body until the client's delayed
+            # acknowledgement of the headers, adding ~40ms to every request.
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                parts = urlsplit(self.path)
+                status, content_type, body = server.respond(parts.path, parts.query)
+                self.send_response(status)
+                self.send_header("Content-Type",   content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+    def start(self) -> None:
+        """
+        Starts the server, in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        """
+        Stops the server, and closes its socket.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+    def __enter__(self) -> "TastypieServer":
+        self.start()
+        return self
+
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+
+# =================================================================================================================================
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the objects in an archive, as the datatracker would")
+    parser.add_argument("archive", type=Path, help="the archive of recorded responses to serve")
+    parser.add_argument("--host",  default="127.0.0.1", help="the address on which to listen")
+    parser.add_argument("--port",  type=int, default=8000, help="the port on which to listen")
+    args = parser.parse_args()
+    server = TastypieServer(args.archive, args.host, args.port)
+    print("Serving {} objects on {}".format(len(server.objects), server.base_url))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+# =================================================================================================================================
+# vim: set tw=0 ai:
@@ -0,0 +1,324 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# The module contains the transports used by DataTracker and RFCIndex to make
+# HTTP requests. The HTTPTransport makes requests over the network. The
+# RecordingTransport records the responses to the requests made through
+# another transport in an archive, and the ReplayTransport answers requests
+# from such an archive, so the clients can be used, and tested, without any
+# network access. See also tastypie_server.py, which serves the objects in an
+# archive over HTTP, as the datatracker would.
+
+from dataclasses            import dataclass
+from pathlib                import Path
+from typing                 import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse           import parse_qsl, urlencode, urlsplit
+from requests.adapters      import HTTPAdapter
+from requests.structures    import CaseInsensitiveDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import functools
+import gzip
+import io
+import json
+import requests
+import threading
+import time
+
+# =================================================================================================================================
+# The interface to a transport:
+
+@dataclass(frozen=True)
+class Response:
+    """
+    The response to an HTTP GET request made using a Transport.
+    """
+    status_code : int
+    headers     : CaseInsensitiveDict
+    content     : bytes = b""
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+
+class StreamedResponse:
+    """
+    The response to an HTTP GET request made using Transport.stream(). The
+    body is read incrementally from the file-like object raw, rather than
+    being held in memory. The response must be closed once the body has been
+    read, to release the connection; it can be used as a context manager.
+    """
+    def __init__(self, status_code: int, headers: CaseInsensitiveDict, raw: BinaryIO, close: Optional[Callable[[], None]] = None) -> None:
+        self.status_code = status_code
+        self.headers     = headers
+        self.raw         = raw
+        self._close      = close if close is not None else raw.close
+
+
+    def close(self) -> None:
+        self._close()
+
+
+    def __enter__(self) -> "StreamedResponse":
+        return self
+
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class Transport:
+    """
+    The interface by which DataTracker and RFCIndex make HTTP GET requests.
+    Subclasses must be safe to use from several threads.
+    """
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        """
+        Makes an HTTP GET request for the specified URL, with the query
+        parameters in params, which are added to any in the URL.
+
+        Raises:
+            requests.ConnectionError or requests.Timeout, if the request fails
+            and should be retried
+        """
+        raise NotImplementedError
+
+
+    def stream(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> StreamedResponse:
+        """
+        Makes an HTTP GET request, as get() does, but returns before the body
+        of the response has been received, so it can be processed as it
+        arrives. By default, this calls get() and wraps the body it returns.
+        """
+        r = self.get(url, params, headers)
+        return StreamedResponse(r.status_code, r.headers, io.BytesIO(r.content))
+
+
+    def close(self) -> None:
+        """
+        Releases any resources held by the transport.
+        """
+        pass
+
+
+# =================================================================================================================================
+# A transport that makes requests over the network:
+#
+# The datatracker objects if more than 100 requests are made on a single
+# persistent HTTP connection. Each connection in the pool counts the requests
+# made on it, and is closed and reopened before it reaches that limit, or
+# once it has been open for longer than a maximum age. This is done per
+# connection, so recycling one connection never disturbs a request that
+# another thread is making on a different connection, and connections are
+# only reopened, paying for a new TLS handshake, when they must be.
+
+class _RecyclingPoolMixin:
+    max_requests : int
+    max_age      : Optional[float]
+
+    def _get_conn(self, timeout: Optional[float] = None) -> Any:
+        conn   = super()._get_conn(timeout) # type: ignore
+        now    = time.monotonic()
+        uses   = getattr(conn, "_ietfdata_uses",   0)
+        opened = getattr(conn, "_ietfdata_opened", now)
+        if uses >= self.max_requests or (self.max_age is not None and now - opened > self.max_age):
+            conn.close()
+            uses   = 0
+            opened = now
+        conn._ietfdata_uses   = uses + 1
+        conn._ietfdata_opened = opened
+        return conn
+
+
+class _RecyclingHTTPConnectionPool(_RecyclingPoolMixin, HTTPConnectionPool):
+    def __init__(self, *args: Any, max_requests: int, max_age: Optional[float], **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.max_requests = max_requests
+        self.max_age      = max_age
+
+
+class _RecyclingHTTPSConnectionPool(_RecyclingPoolMixin, HTTPSConnectionPool):
+    def __init__(self, *args: Any, max_requests: int, max_age: Optional[float], **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.max_requests = max_requests
+        self.max_age      = max_age
+
+
+class _RecyclingAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter whose connections are recycled after max_requests requests,
+    or once they are older than max_age seconds. The pool blocks when all
+    pool_size connections are in use, rather than opening additional
+    connections that would be discarded after one request.
+    """
+    def __init__(self, pool_size: int, max_requests: int, max_age: Optional[float] = None) -> None:
+        self.max_requests = max_requests
+        self.max_age      = max_age
+        super().__init__(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        pool_classes = {
+            "http"  : functools.partial(_RecyclingHTTPConnectionPool,  max_requests=self.max_requests, max_age=self.max_age),
+            "https" : functools.partial(_RecyclingHTTPSConnectionPool, max_requests=self.max_requests, max_age=self.max_age),
+        } # type: Dict[str, Any]
+        self.poolmanager.pool_classes_by_scheme = pool_classes
+
+
+class HTTPTransport(Transport):
+    """
+    A transport that makes requests over the network. Each thread makes its
+    requests using its own requests.Session, and the sessions share a pool of
+    up to pool_size persistent connections. Threads wait for a connection if
+    all are in use. Each connection is closed and reopened after max_requests
+    requests, or once it is older than max_age seconds, if set.
+    """
+    def __init__(self, pool_size: int = 10, max_requests: int = 99, max_age: Optional[float] = None) -> None:
+        self._adapter  = _RecyclingAdapter(pool_size, max_requests, max_age)
+        self._sessions = threading.local()
+
+
+    def session(self) -> requests.Session:
+        """
+        Returns the requests.Session used by the calling thread, creating it
+        if necessary.
+        """
+        session = getattr(self._sessions, "session", None) # type: Optional[requests.Session]
+        if session is None:
+            session = requests.Session()
+            session.mount("http://",  self._adapter)
+            session.mount("https://", self._adapter)
+            self._sessions.session = session
+        return session
+
+
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        r = self.session().get(url, params=params, headers=headers, verify=True, stream=False)
+        return Response(r.status_code, CaseInsensitiveDict(r.headers), r.content)
+
+
+    def stream(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> StreamedResponse:
+        r = self.session().get(url, params=params, headers=headers, verify=True, stream=True)
+        # Undo any gzip or deflate content-encoding as the body is read:
+        r.raw.decode_content = True
+        return StreamedResponse(r.status_code, CaseInsensitiveDict(r.headers), r.raw, r.close)
+
+
+    def close(self) -> None:
+        self._adapter.close()
+
+
+# =================================================================================================================================
+# Archives of recorded responses:
+#
+# An archive is a gzip-compressed file with one JSON object per line, each
+# recording the response to one request. Responses are identified by their
+# URL, with the query parameters in sorted order, so the order in which the
+# parameters were given does not matter. Only the headers in ARCHIVE_HEADERS
+# are recorded. If a URL is recorded more than once, the last response is
+# used. Archives can be appended to, and concatenated, as gzip files can.
+
+ARCHIVE_HEADERS = ["Content-Type", "ETag", "Last-Modified", "Retry-After"]
+
+
+def request_key(url: str, params: Dict[str, Any]) -> str:
+    """
+    Returns the key identifying a request in an archive. This is the URL of
+    the request, including the parameters in params and any already in the
+    URL, with the parameters in sorted order. Parameters whose value is None
+    are omitted, as they are by requests.
+    """
+    parts = urlsplit(url)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True) + [(k, str(v)) for k, v in params.items() if v is not None])
+    return parts._replace(query=urlencode(query), fragment="").geturl()
+
+
+def read_archive(archive: Path) -> Iterator[Tuple[str, Response]]:
+    """
+    Returns the (key, response) pairs recorded in an archive, in the order
+    they were recorded.
+    """
+    with gzip.open(str(archive), "rt", encoding="utf-8") as inf:
+        for line in inf:
+            record = json.loads(line)
+            yield record["url"], Response(record["status"], CaseInsensitiveDict(record["headers"]), record["body"].encode("utf-8"))
+
+
+class RecordingTransport(Transport):
+    """
+    A transport that makes requests using another transport, by default an
+    HTTPTransport, and records each response in an archive. Responses are
+    appended to the archive as they are received, so an existing archive is
+    extended rather than replaced.
+    """
+    def __init__(self, archive: Path, transport: Optional[Transport] = None) -> None:
+        self.archive   = archive
+        self.transport = transport if transport is not None else HTTPTransport()
+        self._lock     = threading.Lock()
+        self._outf     = gzip.open(str(archive), "at", encoding="utf-8")
+
+
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        r = self.transport.get(url, params, headers)
+        record = {
+            "url"     : request_key(url, params),
+            "status"  : r.status_code,
+            "headers" : {name: r.headers[name] for name in ARCHIVE_HEADERS if name in r.headers},
+            "body"    : r.content.decode("utf-8", errors="replace")
+        }
+        with self._lock:
+            self._outf.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return r
+
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._outf.closed:
+                self._outf.close()
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """
+    A transport that answers requests using the responses recorded in an
+    archive, without making any network requests. Requests for which there
+    is no recorded response receive a 404 (Not Found) response.
+    """
+    def __init__(self, archive: Path) -> None:
+        self.archive    = archive
+        self._responses = dict(read_archive(archive)) # type: Dict[str, Response]
+
+
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        r = self._responses.get(request_key(url, params))
+        if r is None:
+            return Response(404, CaseInsensitiveDict())
+        return r
+
+
+# =================================================================================================================================
+# vim: set tw=0 ai:
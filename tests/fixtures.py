@@ -0,0 +1,182 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+# Fixtures shared by the tests and the benchmarks: the JSON of synthetic
+# datatracker objects, and mocks that stand in for the datatracker. The
+# benchmarks add this directory to sys.path to import this module.
+
+import json
+
+from typing        import Any, Dict, List
+from unittest.mock import Mock
+from urllib.parse  import parse_qsl, urlencode
+
+# =================================================================================================================================
+# The JSON of objects, as returned by the datatracker:
+
+def person_json(person_id: int) -> Dict[str, Any]:
+    return {
+        "resource_uri"    : "/api/v1/person/person/{}/".format(person_id),
+        "id"              : person_id,
+        "name"            : "Person {}".format(person_id),
+        "name_from_draft" : "Person {}".format(person_id),
+        "ascii"           : "Person {}".format(person_id),
+        "ascii_short"     : None,
+        "user"            : "",
+        "time"            : "2012-02-26T00:46:44",
+        "photo"           : "",
+        "photo_thumb"     : "",
+        "biography"       : "",
+        "consent"         : True
+    }
+
+
+def document_json(doc_id: int) -> Dict[str, Any]:
+    return {
+        "resource_uri"       : "/api/v1/doc/document/draft-example-{}/".format(doc_id),
+        "id"                 : doc_id,
+        "name"               : "draft-example-{}".format(doc_id),
+        "title"              : "An Example Internet-Draft, Number {}".format(doc_id),
+        "pages"              : 20 + doc_id % 40,
+        "words"              : 5000 + doc_id % 9000,
+        "time"               : "2019-10-14T10:07:15",
+        "notify"             : "",
+        "expires"            : "2020-04-16T10:07:15",
+        "type"               : "/api/v1/name/doctypename/draft/",
+        "rfc"                : None,
+        "rev"                : "01",
+        "abstract"           : "This document describes an example. " * 10,
+        "internal_comments"  : "",
+        "order"              : 1,
+        "note"               : "",
+        "ad"                 : "/api/v1/person/person/{}/".format(doc_id % 100),
+        "shepherd"           : None,
+        "group"              : "/api/v1/group/group/{}/".format(1000 + doc_id % 300),
+        "stream"             : "/api/v1/name/streamname/ietf/",
+        "intended_std_level" : "/api/v1/name/intendedstdlevelname/ps/",
+        "std_level"          : None,
+        "states"             : ["/api/v1/doc/state/1/", "/api/v1/doc/state/38/"],
+        "submissions"        : ["/api/v1/submit/submission/{}/".format(doc_id)],
+        "tags"               : [],
+        "uploaded_filename"  : "",
+        "external_url"       : ""
+    }
+
+
+def document_author_json(author_id: int) -> Dict[str, Any]:
+    return {
+        "resource_uri" : "/api/v1/doc/documentauthor/{}/".format(author_id),
+        "id"           : author_id,
+        "order"        : 1 + author_id % 3,
+        "country"      : "GB",
+        "affiliation"  : "University of Glasgow",
+        "document"     : "/api/v1/doc/document/draft-example-{}/".format(author_id // 3),
+        "person"       : "/api/v1/person/person/{}/".format(author_id % 1000),
+        "email"        : "/api/v1/person/email/person{}@example.com/".format(author_id % 1000)
+    }
+
+
+def document_event_json(event_id: int) -> Dict[str, Any]:
+    return {
+        "resource_uri" : "/api/v1/doc/docevent/{}/".format(event_id),
+        "id"           : event_id,
+        "by"           : "/api/v1/person/person/{}/".format(event_id % 1000),
+        "doc"          : "/api/v1/doc/document/draft-example-{}/".format(event_id % 5000),
+        "desc"         : "New version available",
+        "rev"          : "01",
+        "time"         : "2019-10-14T10:07:15",
+        "type"         : "new_revision"
+    }
+
+
+def session_assignment_json(assignment_id: int) -> Dict[str, Any]:
+    return {
+        "resource_uri" : "/api/v1/meeting/schedtimesessassignment/{}/".format(assignment_id),
+        "id"           : assignment_id,
+        "session"      : "/api/v1/meeting/session/{}/".format(20000 + assignment_id),
+        "agenda"       : "/api/v1/meeting/schedule/{}/".format(700 + assignment_id % 50),
+        "schedule"     : "/api/v1/meeting/schedule/{}/".format(700 + assignment_id % 50),
+        "timeslot"     : "/api/v1/meeting/timeslot/{}/".format(9000 + assignment_id % 2000),
+        "modified"     : "2017-10-17T12:14:33",
+        "notes"        : "",
+        "pinned"       : False,
+        "extendedfrom" : None,
+        "badness"      : 0
+    }
+
+# =================================================================================================================================
+# Mocks, to test the client without contacting the datatracker:
+
+def response(body: Dict[str, Any]) -> Mock:
+    r = Mock()
+    r.status_code = 200
+    r.headers = {}
+    r.content = json.dumps(body).encode("utf-8")
+    r.json.return_value = body
+    return r
+
+
+def fake_datatracker(endpoints: Dict[str, List[Dict[str, Any]]]) -> Mock:
+    # A mock for DataTracker._get() that returns the objects in endpoints,
+    # either individually or as paginated lists, filtered by "__in" on any
+    # field, "id__gt", and "time__gte", and optionally ordered by "id".
+    def get(url: str, params: Dict[str, Any], **kwargs: Any) -> Mock:
+        path, _, query = url[len("https://datatracker.ietf.org"):].partition("?")
+        params = dict(params, **dict(parse_qsl(query)))
+        if path in endpoints:
+            offset = int(params.get("offset", 0))
+            limit  = int(params["limit"])
+            objs   = endpoints[path]
+            for key in [key for key in params if key.endswith("__in")]:
+                objs = [obj for obj in objs if str(obj[key[:-4]]) in params[key].split(",")]
+            if "id__gt" in params:
+                objs = [obj for obj in objs if obj["id"] > int(params["id__gt"])]
+            if "time__gte" in params:
+                objs = [obj for obj in objs if obj["time"] >= params["time__gte"]]
+            if params.get("order_by") == "id":
+                objs = sorted(objs, key=lambda obj: int(obj["id"]))
+            if offset + limit < len(objs):
+                filters  = {k: v for k, v in params.items() if k.endswith("__in") or k in ["id__gt", "time__gte", "order_by"]}
+                next_uri = path + "?" + urlencode(dict(filters, limit=limit, offset=offset + limit))
+            else:
+                next_uri = None
+            return response({"meta"    : {"limit": limit, "offset": offset, "next": next_uri, "total_count": len(objs)},
+                             "objects" : objs[offset:offset + limit]})
+        for objs in endpoints.values():
+            for obj in objs:
+                if obj["resource_uri"] == path:
+                    return response(obj)
+        r = Mock()
+        r.status_code = 404
+        return r
+    return Mock(side_effect=get)
+
+
+def fake_get(num_people: int) -> Mock:
+    # A mock for DataTracker._get() that returns num_people Person objects
+    return fake_datatracker({"/api/v1/person/person/" : [person_json(i) for i in range(num_people)]})
+
+# =================================================================================================================================
+# vim: set tw=0 ai:
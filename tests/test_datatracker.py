@@ -23,17 +23,43 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import json
 import unittest
 import os
+import pickle
+import requests
 import sys
+import tempfile
+import time
+import tracemalloc
 
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses        import fields
 from pathlib       import Path
+from typing        import Any, Dict, List, cast
 from unittest.mock import patch, Mock
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import ietfdata
 from ietfdata.datatracker import *
+from fixtures             import *
+
+
+# =================================================================================================================================
+# Helper functions, to test the client without contacting the datatracker:
+
+def author_json(author_id: int, person_id: int) -> Dict[str, Any]:
+    return {
+        "resource_uri" : "/api/v1/doc/documentauthor/{}/".format(author_id),
+        "id"           : author_id,
+        "order"        : 1,
+        "country"      : "",
+        "affiliation"  : "",
+        "document"     : "/api/v1/doc/document/draft-test-{}/".format(author_id),
+        "person"       : "/api/v1/person/person/{}/".format(person_id),
+        "email"        : "/api/v1/person/email/person{}@example.com/".format(person_id),
+    }
 
 
 # =================================================================================================================================
@@ -1522,6 +1548,661 @@ class TestDatatracker(unittest.TestCase):
         self.assertEqual(subs[0].lists[0],     MailingListURI("/api/v1/mailinglists/list/461/"))
 
 
+# =================================================================================================================================
+# Unit tests that do not contact the datatracker:
+
+class TestDatatrackerOffline(unittest.TestCase):
+
+    def test_retrieve_multi(self) -> None:
+        dt = DataTracker()
+        dt._get = fake_get(250) # type: ignore
+        people = list(dt.people())
+        self.assertEqual([p.id for p in people], list(range(250)))
+        self.assertEqual(dt._get.call_count, 3)
+
+
+    def test_retrieve_multi_parallel(self) -> None:
+        dt = DataTracker(page_workers=4)
+        dt._get = fake_get(1050) # type: ignore
+        people = list(dt.people())
+        self.assertEqual([p.id for p in people], list(range(1050)))
+        self.assertEqual(dt._get.call_count, 11)
+        offsets = sorted(int(call[1]["params"].get("offset", 0)) for call in dt._get.call_args_list)
+        self.assertEqual(offsets, list(range(0, 1100, 100)))
+
+
+    def test_retrieve_multi_prefetch(self) -> None:
+        dt = DataTracker(prefetch_pages=2)
+        dt._get = fake_get(550) # type: ignore
+        people = list(dt.people())
+        self.assertEqual([p.id for p in people], list(range(550)))
+        self.assertEqual(dt._get.call_count, 6)
+
+
+    def test_retrieve_multi_prefetch_abandoned(self) -> None:
+        # The prefetch thread must stop if the caller stops iterating
+        dt = DataTracker(prefetch_pages=1)
+        dt._get = fake_get(100000) # type: ignore
+        people = dt.people()
+        self.assertEqual(next(people).id, 0)
+        del people
+        time.sleep(0.5)
+        calls = dt._get.call_count
+        self.assertLessEqual(calls, 3)
+        time.sleep(0.5)
+        self.assertEqual(dt._get.call_count, calls)
+
+
+    def test_resolve_many(self) -> None:
+        dt = DataTracker()
+        dt._get = fake_get(300) # type: ignore
+        uris = [PersonURI("/api/v1/person/person/{}/".format(i)) for i in range(299, -1, -2)]
+        uris.append(PersonURI("/api/v1/person/person/7"))
+        uris.append(PersonURI("/api/v1/person/person/999/"))
+        people = dt.resolve_many(uris, Person)
+        self.assertEqual([p.id if p is not None else None for p in people], list(range(299, -1, -2)) + [7, None])
+        # Two list queries for the 150 people that exist, then an individual
+        # request for the person that was not returned by the list queries
+        self.assertEqual(dt._get.call_count, 3)
+
+
+    def test_resolve_many_cached(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache_dir=Path(cache_dir))
+            dt._get = fake_get(300) # type: ignore
+            list(dt.resolve_many([PersonURI("/api/v1/person/person/{}/".format(i)) for i in range(0, 10)], Person))
+            self.assertEqual(dt._get.call_count, 1)
+            people = dt.resolve_many([PersonURI("/api/v1/person/person/{}/".format(i)) for i in range(5, 15)], Person)
+            self.assertEqual([p.id if p is not None else None for p in people], list(range(5, 15)))
+            self.assertEqual(dt._get.call_count, 2)
+            self.assertEqual(dt._get.call_args[1]["params"]["id__in"], "10,11,12,13,14")
+
+
+    def test_resolve_many_view(self) -> None:
+        # Objects are resolved in full, without checkpointing the queries, even
+        # when resolve_many() is called on a raw() or checkpoint() view.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint_file = Path(tmpdir, "checkpoint")
+            dt = DataTracker()
+            dt._get = fake_get(300) # type: ignore
+            uris = [PersonURI("/api/v1/person/person/{}/".format(i)) for i in range(0, 200, 2)]
+            for view in [dt.raw(["id"]), dt.checkpoint(checkpoint_file), dt.raw(["id"]).checkpoint(checkpoint_file)]:
+                people = view.resolve_many(uris, Person)
+                self.assertEqual([p.resource_uri for p in people if p is not None], uris)
+            self.assertFalse(checkpoint_file.exists())
+
+
+    def test_resolve_many_historical(self) -> None:
+        # Historical objects are identified by their history_id, not their id
+        def history_json(history_id: int) -> Dict[str, Any]:
+            return dict(person_json(1),
+                        resource_uri          = "/api/v1/person/historicalperson/{}/".format(history_id),
+                        history_change_reason = None,
+                        history_user          = "",
+                        history_id            = history_id,
+                        history_type          = "~",
+                        history_date          = "2019-09-29T14:39:48")
+        dt = DataTracker()
+        dt._get = fake_datatracker({"/api/v1/person/historicalperson/": [history_json(i) for i in range(100, 110)]}) # type: ignore
+        uris = [PersonURI("/api/v1/person/historicalperson/{}/".format(i)) for i in [105, 101, 103]]
+        history = dt.resolve_many(uris, HistoricalPerson)
+        self.assertEqual([h.history_id if h is not None else None for h in history], [105, 101, 103])
+        self.assertEqual(dt._get.call_count, 1)
+        self.assertEqual(dt._get.call_args[1]["params"]["history_id__in"], "105,101,103")
+
+
+    def test_resolve_many_docalias(self) -> None:
+        # Document aliases are identified by their name, not their id
+        def alias_json(alias_id: int) -> Dict[str, Any]:
+            return {
+                "resource_uri" : "/api/v1/doc/docalias/draft-test-{}/".format(alias_id),
+                "id"           : alias_id,
+                "document"     : "/api/v1/doc/document/draft-test-{}/".format(alias_id),
+                "name"         : "draft-test-{}".format(alias_id)
+            }
+        dt = DataTracker()
+        dt._get = fake_datatracker({"/api/v1/doc/docalias/": [alias_json(i) for i in range(10)]}) # type: ignore
+        uris = [DocumentAliasURI("/api/v1/doc/docalias/draft-test-{}/".format(i)) for i in [7, 2, 7, 5]]
+        aliases = dt.resolve_many(uris, DocumentAlias)
+        self.assertEqual([a.name if a is not None else None for a in aliases], ["draft-test-7", "draft-test-2", "draft-test-7", "draft-test-5"])
+        self.assertEqual(dt._get.call_count, 1)
+        self.assertEqual(dt._get.call_args[1]["params"]["name__in"], "draft-test-7,draft-test-2,draft-test-5")
+
+
+    def test_expand(self) -> None:
+        dt = DataTracker()
+        dt._get = fake_datatracker({ # type: ignore
+            "/api/v1/person/person/"      : [person_json(i) for i in range(100)],
+            "/api/v1/doc/documentauthor/" : [author_json(i, i % 50) for i in range(150)]})
+        p = dt.person(PersonURI("/api/v1/person/person/1/"))
+        if p is None:
+            self.fail("Cannot find person")
+        authors = list(dt.documents_authored_by_person(p, expand=["person"]))
+        self.assertEqual(len(authors), 150)
+        # One request for the person, two pages of authors, and one request
+        # to resolve the people referenced from the first page. The people
+        # referenced from the second page were resolved with the first.
+        self.assertEqual(dt._get.call_count, 4)
+        for author in authors:
+            person = dt.person(author.person)
+            if person is not None:
+                self.assertEqual(person.resource_uri, author.person)
+            else:
+                self.fail("Cannot find person")
+        self.assertEqual(dt._get.call_count, 4)
+
+
+    def test_expand_invalid(self) -> None:
+        dt = DataTracker()
+        dt._get = fake_get(10) # type: ignore
+        with self.assertRaises(ValueError):
+            list(dt.documents(expand=["title"]))
+
+
+    def test_expand_storage(self) -> None:
+        endpoints = {
+            "/api/v1/person/person/"      : [person_json(i) for i in range(100)],
+            "/api/v1/doc/documentauthor/" : [author_json(i, i % 50) for i in range(150)]}
+        person = DataTracker()._decode(person_json(1), Person)
+        # Without a cache, the expanded objects have nowhere to be held
+        dt = DataTracker(memory_cache_size=0)
+        dt._get = fake_datatracker(endpoints) # type: ignore
+        with self.assertRaises(ValueError):
+            list(dt.documents_authored_by_person(person, expand=["person"]))
+        self.assertEqual(dt._get.call_count, 0)
+        # With a cache, they are stored in the cache
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dt = DataTracker(memory_cache_size=0, cache=SQLiteCache(Path(tmpdir, "cache.db")))
+            dt._get = fake_datatracker(endpoints) # type: ignore
+            authors = list(dt.documents_authored_by_person(person, expand=["person"]))
+            self.assertEqual(dt._get.call_count, 3)
+            for author in authors:
+                self.assertIsNotNone(dt.person(author.person))
+            self.assertEqual(dt._get.call_count, 3)
+
+
+    def test_retrieve_multi_parallel_single_page(self) -> None:
+        dt = DataTracker(page_workers=4)
+        dt._get = fake_get(42) # type: ignore
+        self.assertEqual(len(list(dt.people())), 42)
+        self.assertEqual(dt._get.call_count, 1)
+
+
+    def test_sqlite_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = SQLiteCache(Path(cache_dir, "cache.db"))
+            self.assertIsNone(cache.get("/api/v1/person/person/1/"))
+            cache.put_many([("/api/v1/person/person/{}/".format(i), person_json(i)) for i in range(3)])
+            entry = cache.get("/api/v1/person/person/1/")
+            if entry is not None:
+                self.assertEqual(entry.obj_json, person_json(1))
+                self.assertLessEqual(entry.fetched, datetime.now())
+            else:
+                self.fail("Cannot find cached object")
+            cache.close()
+
+
+    def test_sqlite_cache_retrieve(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache=SQLiteCache(Path(cache_dir, "cache.db")))
+            dt._get = fake_get(150) # type: ignore
+            self.assertEqual(len(list(dt.people())), 150)
+            self.assertEqual(dt._get.call_count, 2)
+            p = dt.person(PersonURI("/api/v1/person/person/120/"))
+            if p is not None:
+                self.assertEqual(p.id, 120)
+            else:
+                self.fail("Cannot find person")
+            self.assertEqual(dt._get.call_count, 2)
+
+
+    def test_memory_cache(self) -> None:
+        dt = DataTracker()
+        dt._get = fake_get(10) # type: ignore
+        p1 = dt.person(PersonURI("/api/v1/person/person/3/"))
+        p2 = dt.person(PersonURI("/api/v1/person/person/3/"))
+        self.assertIs(p1, p2)
+        self.assertEqual(dt._get.call_count, 1)
+        self.assertEqual(dt.memory_cache.hits,   1)
+        self.assertEqual(dt.memory_cache.misses, 1)
+
+
+    def test_memory_cache_in_front_of_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache_dir=Path(cache_dir))
+            dt._get = fake_get(10) # type: ignore
+            dt.person(PersonURI("/api/v1/person/person/3/"))
+            dt.cache = None
+            p = dt.person(PersonURI("/api/v1/person/person/3/"))
+            if p is not None:
+                self.assertEqual(p.id, 3)
+            else:
+                self.fail("Cannot find person")
+            self.assertEqual(dt._get.call_count, 1)
+
+
+    def test_memory_cache_eviction(self) -> None:
+        dt     = DataTracker()
+        cache  = MemoryCache(max_size=2)
+        people = [dt.pavlova.from_mapping(person_json(i), Person) for i in range(3)]
+        for p in people:
+            cache.put(p)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(people[0].resource_uri.uri, Person))
+        self.assertIs(cache.get(people[2].resource_uri.uri, Person), people[2])
+        self.assertIsNone(cache.get(people[2].resource_uri.uri, Document))
+        self.assertEqual(cache.hits,   1)
+        self.assertEqual(cache.misses, 2)
+
+
+    def test_memory_cache_list(self) -> None:
+        # The results of list queries are not held in memory, so that long
+        # listings do not evict the objects that were retrieved individually
+        dt = DataTracker(memory_cache_size=100)
+        dt._get = fake_get(300) # type: ignore
+        p = dt.person(PersonURI("/api/v1/person/person/1/"))
+        self.assertEqual(len(list(dt.people())), 300)
+        self.assertEqual(len(dt.memory_cache), 1)
+        self.assertIs(dt.person(PersonURI("/api/v1/person/person/1/")), p)
+        self.assertEqual(dt._get.call_count, 4)
+
+
+    def test_query_cache(self) -> None:
+        for cache_type in [FileCache, SQLiteCache]:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = FileCache(Path(cache_dir)) if cache_type == FileCache else SQLiteCache(Path(cache_dir, "cache.db"))
+                dt = DataTracker(cache=cache, query_ttl=timedelta(minutes=5), memory_cache_size=0)
+                dt._get = fake_get(250) # type: ignore
+                self.assertEqual([p.id for p in dt.people()], list(range(250)))
+                self.assertEqual(dt._get.call_count, 3)
+                self.assertEqual([p.id for p in dt.people()], list(range(250)))
+                self.assertEqual(dt._get.call_count, 3)
+                # A different query is not answered from the cache
+                list(dt.people(name_contains="Person"))
+                self.assertEqual(dt._get.call_count, 6)
+
+
+    def test_file_cache_concurrent(self) -> None:
+        # Readers never see a partially written file
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = FileCache(Path(cache_dir))
+            uri   = "/api/v1/person/person/1/"
+            cache.put(uri, person_json(1))
+            def update(i: int) -> str:
+                cache.put(uri, person_json(1))
+                entry = cache.get(uri)
+                return entry.obj_json["name"] if entry is not None else ""
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                names = list(executor.map(update, range(2000)))
+            self.assertEqual(set(names), {"Person 1"})
+            self.assertEqual(os.listdir(Path(cache_dir, "api/v1/person/person")), ["1.json"])
+
+
+    def test_query_cache_expired(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache_dir=Path(cache_dir), query_ttl=timedelta(0))
+            dt._get = fake_get(50) # type: ignore
+            list(dt.people())
+            list(dt.people())
+            self.assertEqual(dt._get.call_count, 2)
+
+
+    def test_query_cache_incomplete(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache_dir=Path(cache_dir), query_ttl=timedelta(minutes=5))
+            dt._get = fake_get(250) # type: ignore
+            people = dt.people()
+            next(people)
+            del people
+            self.assertEqual(len(list(dt.people())), 250)
+            self.assertEqual(dt._get.call_count, 4)
+
+
+    def test_cache_ttl(self) -> None:
+        dt = DataTracker(cache_ttl={GroupURI: timedelta(minutes=5)})
+        self.assertEqual(dt._ttl(Person),       timedelta(days=1))
+        self.assertEqual(dt._ttl(Document),     timedelta(hours=1))
+        self.assertEqual(dt._ttl(Group),        timedelta(minutes=5))
+        self.assertEqual(dt._ttl(Meeting),      timedelta(days=1))
+        self.assertEqual(dt._ttl(DocumentType), None)
+
+
+    def test_cache_revalidate(self) -> None:
+        sent = []  # type: List[Dict[str, str]]
+        def get(url: str, params: Dict[str, Any], headers: Dict[str, str], **kwargs: Any) -> Mock:
+            sent.append(headers)
+            if headers.get("If-None-Match") == '"v1"':
+                r = Mock()
+                r.status_code = 304
+                return r
+            r = response(person_json(1))
+            r.headers = {"ETag": '"v1"'}
+            return r
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache=SQLiteCache(Path(cache_dir, "cache.db")), memory_cache_size=0)
+            dt._get = Mock(side_effect=get) # type: ignore
+            p1 = dt.person(PersonURI("/api/v1/person/person/1/"))
+            dt.person(PersonURI("/api/v1/person/person/1/"))
+            self.assertEqual(len(sent), 1)
+            dt.cache_ttl[PersonURI] = timedelta(0)
+            p3 = dt.person(PersonURI("/api/v1/person/person/1/"))
+            self.assertEqual(len(sent), 2)
+            self.assertEqual(sent[1]["If-None-Match"], '"v1"')
+            self.assertIn("If-Modified-Since", sent[1])
+            self.assertEqual(p1, p3)
+
+
+    def test_sync(self) -> None:
+        people = [dict(person_json(i), time="2020-01-{:02}T00:00:00".format(1 + i // 20)) for i in range(150)]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            state_file = Path(cache_dir, "sync.json")
+            dt = DataTracker(cache_dir=Path(cache_dir))
+            dt._get = fake_datatracker({"/api/v1/person/person/" : people}) # type: ignore
+            summary = dt.sync([Person], state_file)
+            self.assertEqual(summary.total(), 150)
+            self.assertEqual(summary.marks["/api/v1/person/person/"], "2020-01-08T00:00:00")
+            self.assertEqual(dt._get.call_count, 2)
+            # Nothing has changed: only the objects at the high-water mark are fetched
+            summary = dt.sync([Person], state_file)
+            self.assertEqual(summary.total(), 0)
+            self.assertEqual(dt._get.call_args[1]["params"]["time__gte"], "2020-01-08T00:00:00")
+            self.assertEqual(dt._get.call_count, 3)
+            # Two people change
+            people[3]  = dict(people[3],  time="2020-01-09T00:00:00", name="Changed")
+            people[50] = dict(people[50], time="2020-01-09T00:00:00")
+            summary = dt.sync([Person], state_file)
+            self.assertEqual(summary.changed["/api/v1/person/person/"], ["/api/v1/person/person/3/", "/api/v1/person/person/50/"])
+            self.assertEqual(summary.marks["/api/v1/person/person/"], "2020-01-09T00:00:00")
+            self.assertEqual([name for name in os.listdir(cache_dir) if name.startswith("sync.json")], ["sync.json"])
+            dt._get.reset_mock()
+            p = dt.person(PersonURI("/api/v1/person/person/3/"))
+            if p is not None:
+                self.assertEqual(p.name, "Changed")
+            else:
+                self.fail("Cannot find person")
+            self.assertEqual(dt._get.call_count, 0)
+
+
+    def test_sync_invalid(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with self.assertRaises(ValueError):
+                DataTracker(cache_dir=Path(cache_dir)).sync([DocumentType], Path(cache_dir, "sync.json"))
+            # Without a cache, the changed objects would not be stored
+            with self.assertRaises(ValueError):
+                DataTracker().sync([Person], Path(cache_dir, "sync.json"))
+            self.assertFalse(Path(cache_dir, "sync.json").exists())
+
+
+    def test_sync_view(self) -> None:
+        # The objects are synchronised in full, even on a raw() view
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache_dir=Path(cache_dir))
+            dt._get = fake_get(150) # type: ignore
+            summary = dt.raw(["id"]).sync([Person], Path(cache_dir, "sync.json"))
+            self.assertEqual(summary.total(), 150)
+            self.assertIsNotNone(dt._retrieve_from_cache(PersonURI("/api/v1/person/person/3/")))
+
+
+    def test_decode(self) -> None:
+        dt = DataTracker()
+        for obj_json, obj_type in [(person_json(1), Person), (author_json(2, 3), DocumentAuthor)]:
+            obj = dt._decode(obj_json, obj_type) # type: Resource
+            self.assertEqual(obj, dt.pavlova.from_mapping(obj_json, obj_type))
+            self.assertEqual(type(obj.resource_uri), type(dt.pavlova.from_mapping(obj_json, obj_type).resource_uri))
+        # Optional fields, and timestamps that are not in ISO format
+        for value in [{"ascii_short": "P1"}, {"time": "2019-10-14T10:07:15.123"}, {"time": "2019-10-14 10:07:15Z"}]:
+            obj_json = dict(person_json(1), **value)
+            self.assertEqual(dt._decode(obj_json, Person), dt.pavlova.from_mapping(obj_json, Person))
+
+
+    def test_slotted(self) -> None:
+        dt = DataTracker()
+        author = dt._decode(author_json(1, 2), DocumentAuthor)
+        self.assertFalse(hasattr(author, "__dict__"))
+        self.assertFalse(hasattr(author.person, "__dict__"))
+        self.assertEqual(author.person, PersonURI("/api/v1/person/person/2/"))
+        self.assertEqual(pickle.loads(pickle.dumps(author)), author)
+        with self.assertRaises(TypeError):
+            author.person.params["limit"] = "100"
+
+
+    def test_uri_hash(self) -> None:
+        dt = DataTracker()
+        authors = [dt._decode(author_json(i, i % 2), DocumentAuthor) for i in range(4)]
+        # References to the same object share one URI instance
+        self.assertIs(authors[0].person, authors[2].person)
+        self.assertEqual(authors[0].person, PersonURI("/api/v1/person/person/0/"))
+        self.assertEqual(len({a.person for a in authors}), 2)
+        self.assertEqual(len(set(authors)), 4)
+        self.assertIn(PersonURI("/api/v1/person/person/1/"), {a.person: a for a in authors})
+        self.assertNotEqual(PersonURI("/api/v1/person/person/1/"), URI("/api/v1/person/person/1/"))
+        self.assertNotEqual(PersonURI("/api/v1/person/person/"), PersonURI("/api/v1/person/person/", {"limit": "100"}))
+
+
+    def test_raw(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dt = DataTracker(cache_dir=Path(cache_dir))
+            dt._get = fake_get(150) # type: ignore
+            people = list(dt.raw(["id", "name", "time"]).people())
+            self.assertEqual(len(people), 150)
+            self.assertEqual(people[3].id,   3)
+            self.assertEqual(people[3].name, "Person 3")
+            self.assertEqual(people[3].time, datetime(2012, 2, 26, 0, 46, 44))
+            # Objects retrieved in raw mode are not cached, unless requested
+            self.assertIsNone(dt._retrieve_from_cache(PersonURI("/api/v1/person/person/3/")))
+            rows = list(dt.raw(["resource_uri"], cache=True, as_dict=True).people())
+            self.assertEqual(rows[3], {"resource_uri": PersonURI("/api/v1/person/person/3/")})
+            self.assertIsNotNone(dt._retrieve_from_cache(PersonURI("/api/v1/person/person/3/")))
+            # The original DataTracker is unchanged
+            self.assertIsInstance(next(dt.people()), Person)
+
+
+    def test_raw_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            DataTracker().raw(["id", "colour"]).people()
+
+
+    def test_lazy(self) -> None:
+        dt = DataTracker(lazy=True)
+        dt._get = fake_get(150) # type: ignore
+        people = list(dt.people())
+        self.assertEqual(len(people), 150)
+        p = people[3]
+        self.assertIsInstance(p, Person)
+        self.assertEqual(p.name, "Person 3")
+        self.assertEqual(p.time, datetime(2012, 2, 26, 0, 46, 44))
+        self.assertEqual(p, DataTracker()._decode(person_json(3), Person))
+        self.assertEqual(pickle.loads(pickle.dumps(p)), p)
+        with self.assertRaises(Exception):
+            p.name = "Changed" # type: ignore
+
+
+    def test_lazy_memory(self) -> None:
+        def retained(lazy: bool, field_names: List[str]) -> int:
+            dt = DataTracker(lazy=lazy)
+            tracemalloc.start()
+            people = [dt._decode(person_json(i), Person) for i in range(2000)]
+            for p in people:
+                for name in field_names:
+                    getattr(p, name)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return size
+        # Lazy objects do not hold the JSON alongside the decoded fields, so
+        # are not much larger than the equivalent non-lazy objects, however
+        # many of their fields have been read.
+        eager = retained(False, [])
+        self.assertLess(retained(True, ["name"]), 1.5 * eager)
+        self.assertLess(retained(True, [f.name for f in fields(Person)]), 1.5 * eager)
+        dt = DataTracker(lazy=True)
+        p  = dt._decode(person_json(3), Person)
+        self.assertIsNotNone(p._json) # type: ignore
+        self.assertEqual(p, DataTracker()._decode(person_json(3), Person))
+        self.assertIsNone(p._json) # type: ignore
+        obj_json = person_json(3)
+        del obj_json["photo"]
+        with self.assertRaises(TypeError):
+            dt._decode(obj_json, Person).photo
+
+
+    def test_threads(self) -> None:
+        dt = DataTracker(memory_cache_size=0, pool_size=4)
+        with patch.object(requests.Session, "get", fake_get(200)):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                people = list(executor.map(lambda i: dt.person(PersonURI("/api/v1/person/person/{}/".format(i))), range(200)))
+                sessions = set(executor.map(lambda i: id(cast(HTTPTransport, dt.transport).session()), range(200)))
+        self.assertEqual([p.id for p in people if p is not None], list(range(200)))
+        self.assertEqual(dt.http_req, 200)
+        self.assertNotIn(id(dt.session), sessions)
+
+
+    def test_rate_limit(self) -> None:
+        with patch("time.sleep") as sleep:
+            limiter = ietfdata.datatracker._TokenBucket(rate=10.0, burst=2)
+            for i in range(5):
+                limiter.acquire()
+            waits = [call[0][0] for call in sleep.call_args_list]
+            self.assertEqual(len(waits), 3)
+            for wait, expected in zip(waits, [0.1, 0.2, 0.3]):
+                self.assertAlmostEqual(wait, expected, places=2)
+            sleep.reset_mock()
+            limiter = ietfdata.datatracker._TokenBucket(rate=None, burst=2)
+            for i in range(5):
+                limiter.acquire()
+            sleep.assert_not_called()
+
+
+    def test_backoff(self) -> None:
+        overloaded = Mock()
+        overloaded.status_code = 429
+        overloaded.headers = {"Retry-After": "3"}
+        unavailable = Mock()
+        unavailable.status_code = 503
+        unavailable.headers = {}
+        dt = DataTracker(memory_cache_size=0)
+        get = Mock(side_effect=[unavailable, overloaded, response(person_json(1))])
+        with patch.object(requests.Session, "get", get), patch("time.sleep") as sleep, patch("random.uniform", lambda a, b: b):
+            p = dt.person(PersonURI("/api/v1/person/person/1/"))
+            self.assertIsNotNone(p)
+            self.assertEqual(dt.http_req, 3)
+            waits = [call[0][0] for call in sleep.call_args_list]
+            self.assertEqual(len(waits), 2)
+            self.assertAlmostEqual(waits[0], 1.0, places=1)
+            self.assertAlmostEqual(waits[1], 3.0, places=1)
+        # The request is not retried indefinitely
+        get = Mock(return_value=unavailable)
+        with patch.object(requests.Session, "get", get), patch("time.sleep"):
+            self.assertIsNone(dt.person(PersonURI("/api/v1/person/person/1/")))
+            self.assertEqual(get.call_count, dt.max_retries + 1)
+        # Long Retry-After times are limited to BACKOFF_MAX
+        overloaded.headers = {"Retry-After": "86400"}
+        get = Mock(side_effect=[overloaded, response(person_json(1))])
+        with patch.object(requests.Session, "get", get), patch("time.sleep") as sleep:
+            self.assertIsNotNone(dt.person(PersonURI("/api/v1/person/person/1/")))
+            self.assertAlmostEqual(sleep.call_args[0][0], BACKOFF_MAX, places=1)
+
+
+    def test_retry(self) -> None:
+        failed = Mock()
+        failed.status_code = 502
+        failed.headers = {}
+        dt = DataTracker(memory_cache_size=0)
+        get = Mock(side_effect=[requests.ConnectionError(), failed, response(person_json(1))])
+        with patch.object(requests.Session, "get", get), patch("time.sleep") as sleep:
+            self.assertIsNotNone(dt.person(PersonURI("/api/v1/person/person/1/")))
+            self.assertEqual(get.call_count, 3)
+            waits = [call[0][0] for call in sleep.call_args_list]
+            self.assertEqual(len(waits), 2)
+            self.assertTrue(0.0 <= waits[0] <= 1.0)
+            self.assertTrue(0.0 <= waits[1] <= 2.0)
+        dt = DataTracker(memory_cache_size=0, max_retries=2)
+        get = Mock(side_effect=requests.ConnectionError())
+        with patch.object(requests.Session, "get", get), patch("time.sleep"):
+            with self.assertRaises(requests.ConnectionError):
+                dt.person(PersonURI("/api/v1/person/person/1/"))
+            self.assertEqual(get.call_count, 3)
+
+
+    def test_page_error(self) -> None:
+        # A page that cannot be fetched ends the query with an error, rather
+        # than silently truncating the results
+        forbidden = Mock()
+        forbidden.status_code = 403
+        forbidden.headers = {}
+        dt = DataTracker()
+        dt._get = Mock(return_value=forbidden) # type: ignore
+        with self.assertRaises(requests.HTTPError) as cm:
+            list(dt.people())
+        self.assertEqual(cast(Mock, cm.exception.response).status_code, 403)
+
+
+    def test_checkpoint(self) -> None:
+        working = fake_get(250)
+        def failing(url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Mock:
+            if params.get("offset") == "200" or "offset=200" in url:
+                r = Mock()
+                r.status_code = 500
+                r.headers = {}
+                return r
+            return cast(Mock, working(url, params=params, headers=headers))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_file = Path(tmp_dir, "people.checkpoint")
+            dt = DataTracker(max_retries=1)
+            dt._get = Mock(side_effect=failing) # type: ignore
+            people = [] # type: List[Person]
+            with patch("time.sleep"):
+                with self.assertRaises(requests.HTTPError):
+                    for person in dt.checkpoint(checkpoint_file).people():
+                        people.append(person)
+            self.assertEqual(len(people), 200)
+            with open(checkpoint_file) as inf:
+                self.assertEqual(list(json.load(inf).values()), [200])
+            # The query resumes from the page that failed
+            dt._get = working # type: ignore
+            people.extend(dt.checkpoint(checkpoint_file).people())
+            self.assertEqual([p.id for p in people], list(range(250)))
+            self.assertEqual(working.call_args_list[-1][1]["params"]["offset"], "200")
+            with open(checkpoint_file) as inf:
+                self.assertEqual(json.load(inf), {})
+            self.assertEqual(os.listdir(tmp_dir), ["people.checkpoint"])
+            # A query with different parameters is not resumed
+            dt._get = fake_get(250) # type: ignore
+            self.assertEqual(len(list(dt.checkpoint(checkpoint_file).people(name_contains="Person"))), 250)
+
+
+    def test_keyset_paging(self) -> None:
+        people = [person_json(i) for i in reversed(range(250))]
+        dt = DataTracker(keyset_paging=True)
+        dt._get = fake_datatracker({"/api/v1/person/person/" : people}) # type: ignore
+        self.assertEqual([p.id for p in dt.people()], list(range(250)))
+        self.assertEqual(dt._get.call_count, 3)
+        calls = [call[1]["params"] for call in dt._get.call_args_list]
+        self.assertEqual([c.get("id__gt") for c in calls], [None, "99", "199"])
+        self.assertTrue(all(c["order_by"] == "id" and "offset" not in c for c in calls))
+        # Types without a numeric id are paged by offset
+        self.assertFalse(ietfdata.datatracker._keyset_pageable(Email))
+        self.assertTrue(ietfdata.datatracker._keyset_pageable(Person))
+        # Keyset paging can be selected per query
+        dt = DataTracker()
+        dt._get = fake_get(150) # type: ignore
+        self.assertEqual(len(list(dt._retrieve_multi(PersonURI("/api/v1/person/person/"), Person, keyset=True))), 150)
+        self.assertEqual(dt._get.call_args[1]["params"]["id__gt"], "99")
+
+
+    def test_keyset_paging_checkpoint(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_file = Path(tmp_dir, "people.checkpoint")
+            dt = DataTracker(keyset_paging=True)
+            dt._get = fake_get(250) # type: ignore
+            people = dt.checkpoint(checkpoint_file).people()
+            self.assertEqual([next(people).id for i in range(150)], list(range(150)))
+            with open(checkpoint_file) as inf:
+                self.assertEqual(list(json.load(inf).values()), [99])
+            # Resuming fetches the objects after the last id on the consumed page
+            dt._get = fake_get(250) # type: ignore
+            self.assertEqual([p.id for p in dt.checkpoint(checkpoint_file).people()], list(range(100, 250)))
+            self.assertEqual(dt._get.call_args_list[0][1]["params"]["id__gt"], "99")
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,88 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import unittest
+import os
+import sys
+
+from typing        import List
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ietfdata.datatracker       import *
+from ietfdata.datatracker_async import *
+from ietfdata.transport         import HTTPTransport
+from fixtures                   import *
+
+# =================================================================================================================================
+# Unit tests:
+
+class TestAsyncDatatracker(unittest.TestCase):
+
+    def test_person(self) -> None:
+        async def run() -> List[Optional[Person]]:
+            async with AsyncDataTracker(max_concurrency=4) as dt:
+                dt.dt._get = fake_get(10) # type: ignore
+                return await asyncio.gather(*[dt.person(PersonURI("/api/v1/person/person/{}/".format(i))) for i in range(10)])
+        people = asyncio.run(run())
+        self.assertEqual(len(people), 10)
+        for i, p in enumerate(people):
+            if p is not None:
+                self.assertEqual(p.id,   i)
+                self.assertEqual(p.name, "Person {}".format(i))
+            else:
+                self.fail("Cannot find person")
+
+
+    def test_people(self) -> None:
+        async def run() -> List[Person]:
+            async with AsyncDataTracker() as dt:
+                dt.dt._get = fake_get(250) # type: ignore
+                return [p async for p in dt.people()]
+        people = asyncio.run(run())
+        self.assertEqual(len(people), 250)
+        self.assertEqual([p.id for p in people], list(range(250)))
+
+
+
+    def test_close(self) -> None:
+        # Closing the AsyncDataTracker closes the connections to the datatracker
+        with patch.object(HTTPTransport, "close") as close:
+            async def run() -> None:
+                async with AsyncDataTracker() as dt:
+                    dt.dt._get = fake_get(10) # type: ignore
+                    await dt.person(PersonURI("/api/v1/person/person/1/"))
+                    self.assertFalse(close.called)
+                self.assertTrue(close.called)
+            asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# =================================================================================================================================
+# vim: set tw=0 ai:
@@ -26,10 +26,16 @@
 import unittest
 import os
 import sys
+import tempfile
+
+from pathlib                 import Path
+from requests.structures     import CaseInsensitiveDict
+from typing                  import Any, Dict, List
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from ietfdata.rfcindex import *
+from ietfdata.rfcindex  import *
+from ietfdata.transport import *
 
 # ==================================================================================================
 # Unit tests:
@@ -145,6 +151,169 @@ class TestRFCIndex(unittest.TestCase):
         self.assertEqual(rfcs[0].doc_id, "RFC8627")
 
 
+# ==================================================================================================
+# Offline tests, using a small RFC index:
+
+RFC_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rfc-index xmlns="http://www.rfc-editor.org/rfc-index">
+    <bcp-entry>
+        <doc-id>BCP0009</doc-id>
+        <is-also>
+            <doc-id>RFC2026</doc-id>
+        </is-also>
+    </bcp-entry>
+    <fyi-entry>
+        <doc-id>FYI0036</doc-id>
+        <is-also>
+            <doc-id>RFC4949</doc-id>
+        </is-also>
+    </fyi-entry>
+    <rfc-entry>
+        <doc-id>RFC1149</doc-id>
+        <title>Standard for the transmission of IP datagrams on avian carriers</title>
+        <author><name>D. Waitzman</name></author>
+        <date><day>1</day><month>April</month><year>1990</year></date>
+        <format><file-format>ASCII</file-format></format>
+        <page-count>2</page-count>
+        <current-status>EXPERIMENTAL</current-status>
+        <publication-status>EXPERIMENTAL</publication-status>
+        <stream>Legacy</stream>
+        <doi>10.17487/RFC1149</doi>
+    </rfc-entry>
+    <rfc-entry>
+        <doc-id>RFC3550</doc-id>
+        <title>RTP: A Transport Protocol for Real-Time Applications</title>
+        <author><name>H. Schulzrinne</name></author>
+        <author><name>S. Casner</name><title>Editor</title></author>
+        <date><month>July</month><year>2003</year></date>
+        <format><file-format>ASCII</file-format><file-format>PDF</file-format></format>
+        <page-count>104</page-count>
+        <keywords><kw>RTP</kw><kw></kw></keywords>
+        <abstract><p>This memorandum describes RTP.</p><p>It is a transport protocol.</p></abstract>
+        <obsoletes><doc-id>RFC1889</doc-id></obsoletes>
+        <is-also><doc-id>STD0064</doc-id></is-also>
+        <current-status>INTERNET STANDARD</current-status>
+        <publication-status>DRAFT STANDARD</publication-status>
+        <stream>IETF</stream>
+        <area>rai</area>
+        <wg_acronym>avt</wg_acronym>
+        <doi>10.17487/RFC3550</doi>
+    </rfc-entry>
+    <rfc-not-issued-entry>
+        <doc-id>RFC7907</doc-id>
+    </rfc-not-issued-entry>
+    <std-entry>
+        <doc-id>STD0064</doc-id>
+        <title>RTP: A Transport Protocol for Real-Time Applications</title>
+        <is-also>
+            <doc-id>RFC3550</doc-id>
+        </is-also>
+    </std-entry>
+</rfc-index>
+"""
+
+
+class StaticTransport(Transport):
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        return Response(200, CaseInsensitiveDict({"Content-Type": "application/xml"}), RFC_INDEX)
+
+
+class ConditionalTransport(Transport):
+    def __init__(self, etag: str) -> None:
+        self.etag     = etag
+        self.requests = [] # type: List[Dict[str, str]]
+
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == self.etag:
+            return Response(304, CaseInsensitiveDict({"ETag": self.etag}))
+        return Response(200, CaseInsensitiveDict({"ETag": self.etag}), RFC_INDEX)
+
+
+class TestRFCIndexOffline(unittest.TestCase):
+    def check_index(self, index: RFCIndex) -> None:
+        rfc = index.rfc("RFC3550")
+        self.assertIsNotNone(rfc)
+        if rfc is not None:
+            self.assertEqual(rfc.authors,     ["H. Schulzrinne", "S. Casner"])
+            self.assertEqual(rfc.keywords,    ["RTP"])
+            self.assertEqual(rfc.obsoletes,   ["RFC1889"])
+            self.assertEqual(rfc.wg,          "avt")
+            self.assertEqual(rfc.page_count,  104)
+            # The abstract is kept, although the rest of the tree is discarded:
+            self.assertIsNotNone(rfc.abstract)
+            if rfc.abstract is not None:
+                self.assertEqual([p.text for p in rfc.abstract], ["This memorandum describes RTP.", "It is a transport protocol."])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs()], ["RFC1149", "RFC3550"])
+        self.assertEqual(index.rfc_not_issued("RFC7907").doc_id, "RFC7907") # type: ignore
+        self.assertEqual(index.bcp("BCP0009").is_also, ["RFC2026"])          # type: ignore
+        self.assertEqual(index.fyi("FYI0036").is_also, ["RFC4949"])          # type: ignore
+        self.assertEqual(index.std("STD0064").is_also, ["RFC3550"])          # type: ignore
+
+
+    def test_rfc_index_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rfc_index_file = Path(tmpdir, "rfc-index.xml")
+            rfc_index_file.write_bytes(RFC_INDEX)
+            self.check_index(RFCIndex(rfc_index_file=rfc_index_file))
+
+
+    def test_rfc_index_stream(self) -> None:
+        self.check_index(RFCIndex(transport=StaticTransport()))
+
+
+    def test_rfcs(self) -> None:
+        index = RFCIndex(transport=StaticTransport())
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(stream="IETF")],                          ["RFC3550"])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(area="rai", wg="avt", status="INTERNET STANDARD")], ["RFC3550"])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(wg="avt", status="EXPERIMENTAL")],        [])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(stream="IRTF")],                          [])
+        # The since and until dates are inclusive:
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(since="1990-04", until="1990-04")],       ["RFC1149"])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(since="2003-07", until="2003-07", stream="IETF")], ["RFC3550"])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(since="1990-05", until="2003-06")],       [])
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(until="1990-03", stream="Legacy")],       [])
+        # The RFCs are returned in the order they appear in the RFC index:
+        self.assertEqual([rfc.doc_id for rfc in index.rfcs(since="1990-04")],                        ["RFC1149", "RFC3550"])
+
+
+    def test_rfc_index_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_dir = Path(tmpdir, "cache")
+            transport = ConditionalTransport('"v1"')
+
+            # The first request is unconditional, and fills the cache:
+            self.check_index(RFCIndex(transport=transport, cache_dir=cache_dir))
+            self.assertEqual(transport.requests[-1], {})
+            self.assertEqual(Path(cache_dir, "rfc-index.xml").read_bytes(), RFC_INDEX)
+
+            # Later requests are conditional. If the RFC index has not changed,
+            # the snapshot is loaded, and the cached XML is not parsed:
+            Path(cache_dir, "rfc-index.xml").write_bytes(b"not XML")
+            self.check_index(RFCIndex(transport=transport, cache_dir=cache_dir))
+            self.assertEqual(transport.requests[-1], {"If-None-Match": '"v1"'})
+
+            # If the snapshot cannot be read, the cached XML is parsed instead:
+            Path(cache_dir, "rfc-index.xml").write_bytes(RFC_INDEX)
+            Path(cache_dir, "rfc-index.pickle").write_bytes(b"not a pickle")
+            self.check_index(RFCIndex(transport=transport, cache_dir=cache_dir))
+            snapshot = Path(cache_dir, "rfc-index.pickle").read_bytes()
+            Path(cache_dir, "rfc-index.pickle").write_bytes(snapshot[:len(snapshot) // 2])
+            self.check_index(RFCIndex(transport=transport, cache_dir=cache_dir))
+
+            # If the RFC index has changed, it is fetched and parsed again:
+            transport.etag = '"v2"'
+            Path(cache_dir, "rfc-index.xml").write_bytes(b"not XML")
+            self.check_index(RFCIndex(transport=transport, cache_dir=cache_dir))
+            self.assertEqual(transport.requests[-1], {"If-None-Match": '"v1"'})
+            self.check_index(RFCIndex(transport=transport, cache_dir=cache_dir))
+            self.assertEqual(transport.requests[-1], {"If-None-Match": '"v2"'})
+
+            # The files are written to temporary files that are then renamed,
+            # so none are left behind:
+            self.assertEqual(sorted(os.listdir(cache_dir)), ["rfc-index.json", "rfc-index.pickle", "rfc-index.xml"])
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,225 @@
+# Copyright (C) 2020 University of Glasgow
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import gc
+import gzip
+import json
+import requests
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+from http.server  import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib      import Path
+from typing       import Any, Dict, List
+from urllib.parse import urlsplit, parse_qsl
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ietfdata
+from ietfdata.datatracker     import *
+from ietfdata.rfcindex        import *
+from ietfdata.tastypie_server import *
+from ietfdata.transport       import *
+from fixtures                 import *
+
+# =================================================================================================================================
+# Helper functions, to test the transports without contacting the datatracker:
+
+class FakeTransport(Transport):
+    """
+    A transport that answers requests for the objects in endpoints, as the
+    datatracker would, and for the documents in documents.
+    """
+    def __init__(self, endpoints: Dict[str, List[Dict[str, Any]]], documents: Dict[str, str] = {}) -> None:
+        self.endpoints = endpoints
+        self.documents = documents
+        self.objects   = {obj["resource_uri"]: obj for objs in endpoints.values() for obj in objs}
+
+
+    def get(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> Response:
+        if url in self.documents:
+            return Response(200, CaseInsensitiveDict({"Content-Type": "text/xml"}), self.documents[url].encode("utf-8"))
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query), **{k: str(v) for k, v in params.items() if v is not None})
+        json_headers = CaseInsensitiveDict({"Content-Type": "application/json", "ETag": '"v1"'})
+        if parts.path in self.endpoints:
+            page = list_page(parts.path, self.endpoints[parts.path], query)
+            return Response(200, json_headers, json.dumps(page).encode("utf-8"))
+        if parts.path in self.objects:
+            return Response(200, json_headers, json.dumps(self.objects[parts.path]).encode("utf-8"))
+        return Response(404, CaseInsensitiveDict())
+
+
+RFC_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<rfc-index xmlns="http://www.rfc-editor.org/rfc-index">
+</rfc-index>
+"""
+
+# =================================================================================================================================
+# Unit tests:
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = Path(self.tmp_dir.name, "archive.jsonl.gz")
+        # Record the responses to a crawl of the people in a fake datatracker
+        people    = [person_json(i) for i in range(250)]
+        transport = RecordingTransport(self.archive, FakeTransport({"/api/v1/person/person/": people}, {"https://www.rfc-editor.org/rfc-index.xml": RFC_INDEX}))
+        dt = DataTracker(transport=transport)
+        self.assertEqual(len(list(dt.people())), 250)
+        self.assertIsNone(dt.person(PersonURI("/api/v1/person/person/300/")))
+        RFCIndex(transport=transport)
+        transport.close()
+
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+
+    def test_request_key(self) -> None:
+        self.assertEqual(request_key("https://example.com/a/?b=2&a=1", {}),        "https://example.com/a/?a=1&b=2")
+        self.assertEqual(request_key("https://example.com/a/?b=2",     {"a": 1}),  "https://example.com/a/?a=1&b=2")
+        self.assertEqual(request_key("https://example.com/a/",         {}),        "https://example.com/a/")
+
+
+    def test_record(self) -> None:
+        with gzip.open(str(self.archive), "rt") as inf:
+            records = [json.loads(line) for line in inf]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["url"], "https://datatracker.ietf.org/api/v1/person/person/?limit=100&time__gte=1970-01-01T00%3A00%3A00&time__lt=2038-01-19T03%3A14%3A07")
+        self.assertEqual(records[0]["status"], 200)
+        self.assertEqual(records[0]["headers"], {"Content-Type": "application/json", "ETag": '"v1"'})
+        self.assertEqual(records[3]["status"], 404)
+        # Recording again appends to the archive
+        transport = RecordingTransport(self.archive, FakeTransport({}))
+        transport.get("https://datatracker.ietf.org/api/v1/person/person/1/", {}, {})
+        transport.close()
+        self.assertEqual(len(list(read_archive(self.archive))), 6)
+
+
+    def test_replay(self) -> None:
+        dt = DataTracker(transport=ReplayTransport(self.archive))
+        self.assertEqual([p.id for p in dt.people()], list(range(250)))
+        self.assertEqual(dt.http_req, 3)
+        # Objects that were only retrieved in a list are not recorded individually
+        self.assertIsNone(dt.person(PersonURI("/api/v1/person/person/3/")))
+        self.assertEqual(len(list(RFCIndex(transport=ReplayTransport(self.archive)).rfcs())), 0)
+
+
+    def test_views(self) -> None:
+        # Views share the transport of the DataTracker they were created from,
+        # and do not close it when they are closed or garbage collected.
+        transport = RecordingTransport(self.archive, FakeTransport({"/api/v1/person/person/": [person_json(i) for i in range(10)]}))
+        dt = DataTracker(transport=transport)
+        self.assertEqual(len(list(dt.raw(["id"]).people())), 10)
+        view = dt.checkpoint(Path(self.tmp_dir.name, "checkpoint"))
+        self.assertEqual(len(list(view.people())), 10)
+        view.close()
+        del view
+        gc.collect()
+        self.assertEqual(len(list(dt.people())), 10)
+        dt.close()
+        self.assertRaises(ValueError, transport.get, "https://datatracker.ietf.org/api/v1/person/person/", {}, {})
+
+
+    def test_tastypie_server(self) -> None:
+        with TastypieServer(self.archive) as server:
+            self.assertEqual(len(server.objects), 250)
+            url = server.base_url + "/api/v1/person/person/"
+            page = requests.get(url, params={"offset": "240"}).json()
+            self.assertEqual(page["meta"]["limit"],       20)
+            self.assertEqual(page["meta"]["total_count"], 250)
+            self.assertEqual(page["meta"]["next"],        None)
+            self.assertEqual(page["meta"]["previous"],    "/api/v1/person/person/?limit=20&offset=220")
+            self.assertEqual([obj["id"] for obj in page["objects"]], list(range(240, 250)))
+            page = requests.get(url, params={"id__gt": "100", "order_by": "-id", "limit": "5"}).json()
+            self.assertEqual(page["meta"]["next"], "/api/v1/person/person/?id__gt=100&order_by=-id&limit=5&offset=5")
+            self.assertEqual([obj["id"] for obj in page["objects"]], [249, 248, 247, 246, 245])
+            self.assertEqual(requests.get(url, params={"colour__gt": "1"}).status_code, 400)
+            self.assertEqual(requests.get(url, params={"id__like": "1"}).status_code, 400)
+            self.assertEqual(requests.get(server.base_url + "/api/v1/person/email/").status_code, 404)
+            # Objects that were retrieved in a list can be retrieved individually
+            dt = DataTracker(base_url=server.base_url)
+            self.assertEqual([p.id for p in dt.people(name_contains="Person 24")], [24] + list(range(240, 250)))
+            person = dt.person(PersonURI("/api/v1/person/person/3/"))
+            self.assertIsNotNone(person)
+            if person is not None:
+                self.assertEqual(person.name, "Person 3")
+            dt = DataTracker(base_url=server.base_url, keyset_paging=True, memory_cache_size=0)
+            self.assertEqual([p.id for p in dt.people()], list(range(250)))
+            uris = [PersonURI("/api/v1/person/person/{}/".format(i)) for i in [5, 7, 300]]
+            self.assertEqual([p.id if p is not None else None for p in dt.resolve_many(uris, Person)], [5, 7, None])
+            # Other responses are served as recorded
+            self.assertEqual(len(list(RFCIndex(url=server.base_url + "/rfc-index.xml").rfcs())), 0)
+            # An object that is added again replaces the original, in the same position
+            server._add(dict(server.objects["/api/v1/person/person/3/"], name="Changed"))
+            self.assertEqual(server.endpoints["/api/v1/person/person/"][3]["name"], "Changed")
+            self.assertEqual(len(server.endpoints["/api/v1/person/person/"]), 250)
+
+
+    def test_connection_recycling(self) -> None:
+        def connections(adapter: Any, num_requests: int) -> int:
+            # Make num_requests requests using adapter, returning the number of
+            # connections on which they are made
+            clients = [] # type: List[Any]
+            class Handler(BaseHTTPRequestHandler):
+                protocol_version = "HTTP/1.1"
+                def do_GET(self) -> None:
+                    clients.append(self.client_address)
+                    self.send_response(200)
+                    self.send_header("Content-Length", "2")
+                    self.end_headers()
+                    self.wfile.write(b"{}")
+                def log_message(self, *args: Any) -> None:
+                    pass
+            server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                session = requests.Session()
+                session.mount("http://", adapter)
+                for i in range(num_requests):
+                    self.assertEqual(session.get("http://127.0.0.1:{}/".format(server.server_port)).status_code, 200)
+                session.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+            self.assertEqual(len(clients), num_requests)
+            return len(set(clients))
+        # Each connection is used for three requests, then replaced
+        self.assertEqual(connections(ietfdata.transport._RecyclingAdapter(pool_size=1, max_requests=3), 7), 3)
+        # Each connection is replaced once it is too old
+        self.assertEqual(connections(ietfdata.transport._RecyclingAdapter(pool_size=1, max_requests=99, max_age=0.0), 4), 4)
+        self.assertEqual(connections(ietfdata.transport._RecyclingAdapter(pool_size=1, max_requests=99, max_age=60.0), 4), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# =================================================================================================================================
+# vim: set tw=0 ai: